@@ -7,14 +7,7 @@ import sys
 from datetime import datetime, date, timedelta
 import requests
 from loguru import logger
-
-# 配置日志
-logger.remove()
-logger.add(
-    sys.stdout,
-    level="INFO",
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-)
+from common.log import setup_logging
 
 API_URL = "https://alpha123.uk/api/data?fresh=1"
 # 本地状态文件路径
@@ -261,6 +254,39 @@ def format_simple(title, airdrops, last_airdrops):
     return "\n".join(lines)
 
 
+def check_update(data, send=None):
+    """对比最新数据与上次状态，有变化时推送并保存状态，返回是否有更新"""
+    global current_last_today, current_last_forecast
+    send = send or send_telegram_message_new
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    last_today, last_forecast = current_last_today, current_last_forecast
+
+    today_data, forecast_data = classify_airdrops(data)
+
+    if today_data == last_today and forecast_data == last_forecast:
+        logger.info(f"[{now}] 今日空投与预告无变化")
+        return False
+
+    logger.info(f"[{now}] 今日空投与预告有更新")
+
+    if today_data or forecast_data:
+        message = (
+            f"[Alpha网站监控] 今日空投与预告有更新\n\n"
+            + format_simple("今日空投", today_data, last_today)
+            + "\n\n"
+            + format_simple("空投预告", forecast_data, last_forecast)
+            + "\n\n"
+            + "数据来源：https://alpha123.uk"
+        )
+        logger.info(message)
+        send(message)
+
+    # 更新状态并保存到本地文件
+    current_last_today, current_last_forecast = today_data, forecast_data
+    save_state(today_data, forecast_data)
+    return True
+
+
 def main():
     global current_last_today, current_last_forecast
 
@@ -269,8 +295,7 @@ def main():
     signal.signal(signal.SIGTERM, signal_handler)
 
     # 从本地文件加载之前的状态
-    last_today, last_forecast = load_state()
-    current_last_today, current_last_forecast = last_today, last_forecast
+    current_last_today, current_last_forecast = load_state()
 
     logger.info(f"[启动] Alpha 监控程序已启动，监控间隔: 10分钟")
     logger.info(f"[启动] 状态文件: {STATE_FILE}")
@@ -283,33 +308,12 @@ def main():
             time.sleep(600)
             continue
 
-        today_data, forecast_data = classify_airdrops(data)
-
-        if today_data != last_today or forecast_data != last_forecast:
-            logger.info(f"[{now}] 今日空投与预告有更新")
-
-            if today_data or forecast_data:
-                message = (
-                    f"[Alpha网站监控] 今日空投与预告有更新\n\n"
-                    + format_simple("今日空投", today_data, last_today)
-                    + "\n\n"
-                    + format_simple("空投预告", forecast_data, last_forecast)
-                    + "\n\n"
-                    + "数据来源：https://alpha123.uk"
-                )
-                logger.info(message)
-                send_telegram_message_new(message)
-
-            # 更新状态并保存到本地文件
-            last_today = today_data
-            last_forecast = forecast_data
-            current_last_today, current_last_forecast = last_today, last_forecast
-            save_state(last_today, last_forecast)
-        else:
-            logger.info(f"[{now}] 今日空投与预告无变化")
+        check_update(data)
 
         time.sleep(random.randint(300, 600))  # 10分钟
 
 
 if __name__ == "__main__":
+    # 只在独立运行时配置日志，被 runner / bench 导入时由它们统一配置
+    setup_logging("alpha_monitor")
     main()
@@ -0,0 +1,256 @@
+"""
+离线基准 / 回放：在子进程中启动替身服务（fakes.py），把 alpha_monitor、ys_monitor、bwenews
+指向它并按 runner 的方式运行，结束后输出每个监控的每轮 CPU 时间、内存增长和 事件 -> 通知 延迟分位数。
+不访问真实网站，所有 Telegram 消息都发到替身服务。
+
+    python bench.py --duration 120
+    python bench.py --monitors bwenews --news-rate 6000 --duration 1800   # 长时间运行观察内存增长
+    python bench.py --monitors ys --ys-file alerts.json --json result.json
+
+多个监控同时运行时每轮 CPU 会互相掺杂，需要干净的单项数据时用 --monitors 只跑一个。
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import asyncio
+import tempfile
+import subprocess
+import aiohttp
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "runner"))
+sys.path.append(ROOT)
+
+import runner  # noqa: E402  同时导入了各监控模块
+from runner import alpha, ys, bwenews, pipeline, Notifier, current_rss_mb  # noqa: E402
+from common.log import setup_logging  # noqa: E402
+from common.stats import percentile  # noqa: E402
+
+FAKES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fakes.py")
+MONITORS = ("alpha", "ys", "bwenews")
+BENCH_TOKEN = "bench"  # 替身 Telegram 的路径参数不能为空
+
+
+class CycleStats:
+    """每轮（alpha/ys 一次轮询，bwenews 一条消息）占用的进程 CPU 时间"""
+
+    def __init__(self):
+        self.samples = []
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+
+    def summary(self):
+        return {
+            "cycles": len(self.samples),
+            "cpu_p50_ms": round(percentile(self.samples, 0.5) * 1e3, 3),
+            "cpu_p99_ms": round(percentile(self.samples, 0.99) * 1e3, 3),
+            "cpu_total_s": round(sum(self.samples), 3),
+        }
+
+
+class MemoryTrace:
+    """定时采样常驻内存，增长率用最小二乘拟合（MB/小时），忽略启动阶段的一次性分配"""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.samples = []
+
+    async def run(self):
+        started = time.monotonic()
+        while True:
+            self.samples.append((time.monotonic() - started, current_rss_mb()))
+            await asyncio.sleep(self.interval)
+
+    def summary(self):
+        samples = self.samples[len(self.samples) // 10 :]
+        if len(samples) < 2:
+            return {"rss_mb": round(current_rss_mb(), 1)}
+        n = len(samples)
+        mean_t = sum(t for t, _ in samples) / n
+        mean_m = sum(m for _, m in samples) / n
+        var = sum((t - mean_t) ** 2 for t, _ in samples) or 1.0
+        slope = sum((t - mean_t) * (m - mean_m) for t, m in samples) / var
+        return {
+            "rss_start_mb": round(self.samples[0][1], 1),
+            "rss_end_mb": round(self.samples[-1][1], 1),
+            "growth_mb_per_hour": round(slope * 3600, 2),
+        }
+
+
+async def wait_ready(session, base, timeout=15):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            async with session.get(f"{base}/stats") as response:
+                if response.status == 200:
+                    return
+        except aiohttp.ClientError:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("替身服务未能启动")
+
+
+def alpha_task(session, send, stats, interval):
+    alpha.STATE_FILE = os.path.join(tempfile.mkdtemp(), "alpha_state.json")
+    alpha.current_last_today, alpha.current_last_forecast = [], []
+    job = runner.alpha_job(session, send)
+
+    async def run():
+        while True:
+            t0 = time.process_time()
+            try:
+                await job()
+            except Exception as e:
+                runner.logger.error(f"[基准] alpha 轮询失败: {e}")
+            stats.add(time.process_time() - t0)
+            await asyncio.sleep(interval)
+
+    return run()
+
+
+def ys_task(session, send, stats):
+    state = {}
+
+    async def run():
+        while True:
+            t0 = time.process_time()
+            delay = await ys.poll_once(session, state, send)
+            stats.add(time.process_time() - t0)
+            await asyncio.sleep(delay)
+
+    return run()
+
+
+def bwenews_tasks(send, stats):
+    async def notify_sink(event):
+        send(pipeline.format_telegram(event))
+
+    pipeline.SINK_REGISTRY["notify"] = notify_sink
+    news_pipeline = pipeline.NewsPipeline(sinks=["log", "notify"], enricher=None)
+    process = news_pipeline.process
+
+    async def timed_process(raw, recv_ts):
+        t0 = time.process_time()
+        try:
+            return await process(raw, recv_ts)
+        finally:
+            stats.add(time.process_time() - t0)
+
+    news_pipeline.process = timed_process
+    return [bwenews.listen(news_pipeline), news_pipeline.run()]
+
+
+async def bench(args):
+    base = f"http://127.0.0.1:{args.port}"
+    runner.TELEGRAM_API = base
+    alpha.API_URL = f"{base}/api/data"
+    ys.API_URL = f"{base}/alerts-history/"
+    bwenews.WS_URL = f"ws://127.0.0.1:{args.port}/ws"
+
+    fake_args = [
+        "--port", str(args.port),
+        "--alpha-rate", str(args.alpha_rate if "alpha" in args.monitors else 0),
+        "--ys-rate", str(args.ys_rate if "ys" in args.monitors else 0),
+        "--news-rate", str(args.news_rate if "bwenews" in args.monitors else 0),
+        "--telegram-429", str(args.telegram_429),
+    ]
+    for flag in ("alpha_file", "ys_file", "news_archive"):
+        if getattr(args, flag):
+            fake_args += [f"--{flag.replace('_', '-')}", getattr(args, flag)]
+    fakes = subprocess.Popen([sys.executable, FAKES, *fake_args])
+
+    try:
+        async with aiohttp.ClientSession() as session:
+            await wait_ready(session, base)
+            notifier = Notifier(session)
+            stats = {name: CycleStats() for name in args.monitors}
+            memory = MemoryTrace(args.sample_interval)
+            tasks = [notifier.run(), memory.run()]
+            if "alpha" in args.monitors:
+                send = notifier.sender(BENCH_TOKEN, "bench", parse_mode="HTML")
+                tasks.append(alpha_task(session, send, stats["alpha"], args.alpha_interval))
+            if "ys" in args.monitors:
+                send = notifier.sender(BENCH_TOKEN, "bench", parse_mode="HTML")
+                tasks.append(ys_task(session, send, stats["ys"]))
+            if "bwenews" in args.monitors:
+                send = notifier.sender(BENCH_TOKEN, "bench", disable_web_page_preview=True)
+                tasks.extend(bwenews_tasks(send, stats["bwenews"]))
+
+            cpu0, wall0 = time.process_time(), time.monotonic()
+            running = [asyncio.ensure_future(t) for t in tasks]
+            await asyncio.sleep(args.duration)
+            # 留一点时间让已产生的事件发完通知
+            await asyncio.sleep(args.drain)
+            cpu, wall = time.process_time() - cpu0, time.monotonic() - wall0
+            for task in running:
+                task.cancel()
+            await asyncio.gather(*running, return_exceptions=True)
+
+            async with session.get(f"{base}/stats") as response:
+                latency = await response.json()
+    finally:
+        fakes.terminate()
+        fakes.wait()
+
+    names = {"alpha": "alpha_monitor", "ys": "ys_monitor", "bwenews": "bwenews"}
+    return {
+        "duration_s": round(wall, 1),
+        "process_cpu_ratio": round(cpu / wall, 4),
+        "memory": memory.summary(),
+        "monitors": {
+            names[m]: {**stats[m].summary(), **latency.get(names[m], {"generated": 0})}
+            for m in args.monitors
+        },
+    }
+
+
+def print_report(result):
+    print(f"\n运行 {result['duration_s']}s，进程 CPU 占用 {result['process_cpu_ratio'] * 100:.2f}%")
+    print("内存: " + ", ".join(f"{k}={v}" for k, v in result["memory"].items()))
+    header = f"{'monitor':<14}{'cycles':>8}{'cpu p50':>10}{'cpu p99':>10}{'events':>8}{'notified':>9}{'lat p50':>10}{'lat p90':>10}{'lat p99':>10}"
+    print(header)
+    for name, m in result["monitors"].items():
+        print(
+            f"{name:<14}{m['cycles']:>8}{m['cpu_p50_ms']:>8.3f}ms{m['cpu_p99_ms']:>8.3f}ms"
+            f"{m['generated']:>8}{m.get('notified', 0):>9}"
+            f"{m.get('p50_ms', 0):>8.1f}ms{m.get('p90_ms', 0):>8.1f}ms{m.get('p99_ms', 0):>8.1f}ms"
+        )
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="监控离线基准")
+    parser.add_argument("--monitors", default="alpha,ys,bwenews", help="逗号分隔: alpha,ys,bwenews")
+    parser.add_argument("--duration", type=float, default=60, help="运行时长（秒）")
+    parser.add_argument("--drain", type=float, default=3, help="结束前等待通知发完的时间（秒）")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--alpha-interval", type=float, default=1.0, help="alpha 轮询间隔（秒），线上为 5~10 分钟")
+    parser.add_argument("--alpha-rate", type=float, default=6, help="空投变化次数 / 分钟")
+    parser.add_argument("--ys-rate", type=float, default=12, help="新警报条数 / 分钟")
+    parser.add_argument("--news-rate", type=float, default=120, help="新闻条数 / 分钟")
+    parser.add_argument("--alpha-file", help="录制的 alpha123 /api/data 响应（JSON）")
+    parser.add_argument("--ys-file", help="录制的 alerts-history 响应（JSON）")
+    parser.add_argument("--news-archive", help="bwenews 归档目录，回放其中的原始消息")
+    parser.add_argument("--telegram-429", type=float, default=0.0, help="替身 Telegram 返回 429 的概率")
+    parser.add_argument("--sample-interval", type=float, default=5, help="内存采样间隔（秒）")
+    parser.add_argument("--log-level", default="INFO")
+    parser.add_argument("--json", help="结果另存为 JSON")
+    args = parser.parse_args(argv)
+    args.monitors = [m.strip() for m in args.monitors.split(",") if m.strip()]
+    unknown = set(args.monitors) - set(MONITORS)
+    if unknown:
+        parser.error(f"未知的监控: {', '.join(sorted(unknown))}")
+    return args
+
+
+if __name__ == "__main__":
+    cli_args = parse_args()
+    # 日志只写文件（logs/bench.jsonl），保留监控自身的日志开销但不刷屏
+    setup_logging("bench", level=cli_args.log_level, console=False)
+    report = asyncio.run(bench(cli_args))
+    print_report(report)
+    if cli_args.json:
+        with open(cli_args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
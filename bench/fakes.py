@@ -0,0 +1,249 @@
+"""
+离线替身服务：alpha123 空投接口、tzevaadom 警报历史、bwenews WebSocket 和 Telegram sendMessage，
+按配置的速率产生录制或合成的事件。每个事件带唯一标记 EV<n>，假 Telegram 收到包含该标记的消息时
+记录 事件产生 -> 收到通知 的延迟，/stats 返回各监控的延迟分位数。
+
+    python fakes.py --port 8765 --alpha-rate 6 --ys-rate 12 --news-rate 120
+"""
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+import asyncio
+from datetime import date
+from aiohttp import web, WSMsgType
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(os.path.join(ROOT, "bwenews"))
+sys.path.append(ROOT)
+
+from common.stats import percentile  # noqa: E402
+
+# === 🔧 替身服务配置 ===
+ALPHA_KEEP = 20  # 空投接口保留的最新条目数
+YS_KEEP = 50  # 警报历史保留的最新条目数
+NEWS_TICKERS = ["BTC", "ETH", "SOL", "BNB", "DOGE"]
+NEWS_KEYWORDS = ["listing", "delist", "hack", "etf"]
+MARKER = re.compile(r"EV(\d+)")
+
+
+class EventLog:
+    """事件编号 -> (监控名, 产生时间)；收到通知时按编号算延迟，每个事件只算第一次"""
+
+    def __init__(self):
+        self.next_id = 0
+        self.events = {}
+        self.latencies = {}
+        self.generated = {}
+        self.notifications = 0
+
+    def new(self, monitor):
+        self.next_id += 1
+        self.events[self.next_id] = (monitor, time.time())
+        self.generated[monitor] = self.generated.get(monitor, 0) + 1
+        return f"EV{self.next_id}"
+
+    def notified(self, text):
+        now = time.time()
+        self.notifications += 1
+        for marker in set(MARKER.findall(text)):
+            event = self.events.pop(int(marker), None)
+            if event is not None:
+                monitor, ts = event
+                self.latencies.setdefault(monitor, []).append(now - ts)
+
+    def stats(self):
+        result = {"notifications": self.notifications}
+        for monitor, generated in self.generated.items():
+            samples = self.latencies.get(monitor, [])
+            result[monitor] = {
+                "generated": generated,
+                "notified": len(samples),
+                "p50_ms": round(percentile(samples, 0.5) * 1e3, 2),
+                "p90_ms": round(percentile(samples, 0.9) * 1e3, 2),
+                "p99_ms": round(percentile(samples, 0.99) * 1e3, 2),
+                "max_ms": round(max(samples, default=0) * 1e3, 2),
+            }
+        return result
+
+
+class FakeUpstreams:
+    def __init__(self, args):
+        self.args = args
+        self.log = EventLog()
+        self.airdrops = self._load(args.alpha_file, {"airdrops": []})["airdrops"][-ALPHA_KEEP:]
+        self.alerts = self._load(args.ys_file, [])[:YS_KEEP]
+        self.ys_version = 0
+        self.news_clients = set()
+        self.news_recorded = self._recorded_news(args.news_archive)
+        self.telegram_429 = args.telegram_429
+
+    @staticmethod
+    def _load(path, default):
+        if not path:
+            return default
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
+    @staticmethod
+    def _recorded_news(directory):
+        if not directory:
+            return []
+        from archive import read_range
+
+        return [raw for _, raw in read_range(directory=directory)]
+
+    # --- 事件产生 ---
+
+    def new_airdrop(self):
+        marker = self.log.new("alpha_monitor")
+        self.airdrops.append(
+            {
+                "token": marker,
+                "date": date.today().isoformat(),
+                "time": f"{random.randint(0, 23):02d}:{random.choice(['00', '30'])}",
+                "type": random.choice(["grab", "tge"]),
+                "phase": 1,
+                "points": random.randint(100, 250),
+                "amount": random.randint(10, 5000),
+                "contract_address": "0x" + os.urandom(20).hex(),
+            }
+        )
+        del self.airdrops[:-ALPHA_KEEP]
+
+    def new_alert(self):
+        marker = self.log.new("ys_monitor")
+        cities = [marker] + random.sample(["Tel Aviv", "Haifa", "Ashdod", "Sderot", "Eilat"], 3)
+        self.ys_version += 1
+        self.alerts.insert(
+            0,
+            {
+                "id": self.ys_version + 10**9,
+                "alerts": [
+                    {"time": int(time.time()), "cities": cities, "threat": 0, "isDrill": False}
+                ],
+            },
+        )
+        del self.alerts[YS_KEEP:]
+
+    def new_news(self):
+        marker = self.log.new("bwenews")
+        if self.news_recorded:
+            raw = random.choice(self.news_recorded)
+            try:
+                data = json.loads(raw)
+                data["news_title"] = f"{data.get('news_title') or data.get('title') or ''} {marker}"
+                return json.dumps(data, ensure_ascii=False)
+            except (TypeError, ValueError):
+                return f"{raw} {marker}"
+        coin = random.choice(NEWS_TICKERS)
+        return json.dumps(
+            {
+                "news_title": f"${coin} {random.choice(NEWS_KEYWORDS)} update {marker}",
+                "coins_included": [coin],
+                "url": f"https://example.invalid/{marker}",
+                "source_name": "bench",
+            }
+        )
+
+    async def generate(self, rate_per_min, produce):
+        if rate_per_min <= 0:
+            return
+        while True:
+            # 泊松到达，贴近真实的突发分布
+            await asyncio.sleep(random.expovariate(rate_per_min / 60))
+            produce()
+
+    async def broadcast_news(self):
+        message = self.new_news()
+        for ws in list(self.news_clients):
+            try:
+                await ws.send_str(message)
+            except ConnectionError:
+                self.news_clients.discard(ws)
+
+    # --- HTTP / WS 接口 ---
+
+    async def alpha_data(self, request):
+        return web.json_response({"airdrops": self.airdrops})
+
+    async def alerts_history(self, request):
+        etag = f'"{self.ys_version}"'
+        if request.headers.get("If-None-Match") == etag:
+            return web.Response(status=304, headers={"ETag": etag})
+        return web.json_response(self.alerts, headers={"ETag": etag})
+
+    async def news_ws(self, request):
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+        self.news_clients.add(ws)
+        try:
+            async for msg in ws:
+                if msg.type == WSMsgType.ERROR:
+                    break
+        finally:
+            self.news_clients.discard(ws)
+        return ws
+
+    async def telegram(self, request):
+        if self.telegram_429 and random.random() < self.telegram_429:
+            return web.json_response(
+                {"ok": False, "error_code": 429, "parameters": {"retry_after": 1}}, status=429
+            )
+        data = await request.post()
+        self.log.notified(data.get("text", ""))
+        return web.json_response({"ok": True, "result": {}})
+
+    async def stats(self, request):
+        return web.json_response(self.log.stats())
+
+    def app(self):
+        app = web.Application()
+        app.router.add_get("/api/data", self.alpha_data)
+        app.router.add_get("/alerts-history/", self.alerts_history)
+        app.router.add_get("/ws", self.news_ws)
+        app.router.add_post("/bot{token}/sendMessage", self.telegram)
+        app.router.add_get("/stats", self.stats)
+
+        async def start_generators(app):
+            args = self.args
+            app["generators"] = [
+                asyncio.ensure_future(self.generate(args.alpha_rate, self.new_airdrop)),
+                asyncio.ensure_future(self.generate(args.ys_rate, self.new_alert)),
+                asyncio.ensure_future(
+                    self.generate(
+                        args.news_rate, lambda: asyncio.ensure_future(self.broadcast_news())
+                    )
+                ),
+            ]
+
+        async def stop_generators(app):
+            for task in app["generators"]:
+                task.cancel()
+
+        app.on_startup.append(start_generators)
+        app.on_cleanup.append(stop_generators)
+        return app
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="监控替身服务")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--alpha-rate", type=float, default=6, help="空投变化次数 / 分钟")
+    parser.add_argument("--ys-rate", type=float, default=12, help="新警报条数 / 分钟")
+    parser.add_argument("--news-rate", type=float, default=120, help="新闻条数 / 分钟")
+    parser.add_argument("--alpha-file", help="录制的 alpha123 /api/data 响应（JSON）")
+    parser.add_argument("--ys-file", help="录制的 alerts-history 响应（JSON）")
+    parser.add_argument("--news-archive", help="bwenews 归档目录，回放其中的原始消息")
+    parser.add_argument("--telegram-429", type=float, default=0.0, help="假 Telegram 返回 429 的概率")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    cli_args = parse_args()
+    web.run_app(
+        FakeUpstreams(cli_args).app(), host="127.0.0.1", port=cli_args.port, print=None
+    )
@@ -0,0 +1,128 @@
+import os
+import json
+import gzip
+import time
+import asyncio
+from loguru import logger
+
+# === 🔧 新闻归档配置 ===
+ARCHIVE_DIR = "logs/archive"  # 容器内即 /app/logs/archive，对应 docker-compose 挂载的 ./logs/bwenews
+FLUSH_INTERVAL = 1.0  # 缓冲区落盘间隔（秒）
+FLUSH_RECORDS = 500  # 缓冲区达到该条数立即落盘
+SEGMENT_BYTES = 64 * 1024 * 1024  # 单个分段文件上限（字节）
+SEGMENT_SECONDS = 24 * 3600  # 单个分段文件最长时间跨度（秒）
+
+SEGMENT_SUFFIX = ".jsonl.gz"
+INDEX_SUFFIX = ".idx"
+
+
+def encode_block(records):
+    """一批记录编码成一个独立的 gzip member，可以单独 seek 到该位置解压"""
+    lines = "".join(
+        json.dumps({"ts": ts, "msg": raw}, ensure_ascii=False) + "\n" for ts, raw in records
+    )
+    return gzip.compress(lines.encode("utf-8"), compresslevel=6)
+
+
+class NewsArchive:
+    """
+    追加写入压缩分段的新闻归档。
+    接收路径只调用 append()（一次 list.append），压缩和写盘在后台批量完成；
+    每个分段旁边有一个稀疏索引文件，记录每个 gzip 块的时间范围和偏移，
+    按时间范围读取时只解压相关的块。
+    """
+
+    def __init__(self, directory=ARCHIVE_DIR):
+        self.directory = directory
+        self.buffer = []
+        self.segment = None
+        self.segment_start = 0
+        self.segment_size = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def append(self, recv_ts, raw):
+        self.buffer.append((recv_ts, raw))
+
+    def _open_segment(self, first_ts):
+        name = time.strftime("news-%Y%m%d-%H%M%S", time.localtime(first_ts))
+        self.segment = os.path.join(self.directory, name + SEGMENT_SUFFIX)
+        self.segment_start = first_ts
+        self.segment_size = (
+            os.path.getsize(self.segment) if os.path.exists(self.segment) else 0
+        )
+        logger.info(f"[归档] 新分段: {self.segment}")
+
+    def _write(self, records):
+        """在线程中执行：压缩一批记录并追加到当前分段，同时写入索引"""
+        first_ts, last_ts = records[0][0], records[-1][0]
+        if (
+            self.segment is None
+            or self.segment_size >= SEGMENT_BYTES
+            or first_ts - self.segment_start >= SEGMENT_SECONDS
+        ):
+            self._open_segment(first_ts)
+        block = encode_block(records)
+        with open(self.segment, "ab") as f:
+            f.write(block)
+        entry = {
+            "first": first_ts,
+            "last": last_ts,
+            "offset": self.segment_size,
+            "length": len(block),
+            "count": len(records),
+        }
+        with open(self.segment[: -len(SEGMENT_SUFFIX)] + INDEX_SUFFIX, "a") as f:
+            f.write(json.dumps(entry) + "\n")
+        self.segment_size += len(block)
+
+    async def flush(self):
+        if not self.buffer:
+            return
+        records, self.buffer = self.buffer, []
+        records = [(ts, raw.decode("utf-8", "replace") if isinstance(raw, bytes) else raw)
+                   for ts, raw in records]
+        try:
+            await asyncio.to_thread(self._write, records)
+        except Exception as e:
+            logger.error(f"[归档] 写入失败，丢弃 {len(records)} 条: {e}")
+
+    async def run(self):
+        try:
+            while True:
+                deadline = time.time() + FLUSH_INTERVAL
+                while time.time() < deadline and len(self.buffer) < FLUSH_RECORDS:
+                    await asyncio.sleep(0.05)
+                await self.flush()
+        finally:
+            await self.flush()
+
+
+def load_index(directory=ARCHIVE_DIR):
+    """返回 [(分段路径, [索引项...])]，按分段文件名（即开始时间）排序"""
+    segments = []
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith(INDEX_SUFFIX):
+            continue
+        base = os.path.join(directory, name[: -len(INDEX_SUFFIX)])
+        with open(base + INDEX_SUFFIX, "r") as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+        segments.append((base + SEGMENT_SUFFIX, entries))
+    return segments
+
+
+def read_range(start_ts=None, end_ts=None, directory=ARCHIVE_DIR):
+    """按接收时间读取 [start_ts, end_ts] 内的消息，只解压时间范围有重叠的块"""
+    start_ts = start_ts if start_ts is not None else float("-inf")
+    end_ts = end_ts if end_ts is not None else float("inf")
+    for path, entries in load_index(directory):
+        blocks = [e for e in entries if e["last"] >= start_ts and e["first"] <= end_ts]
+        if not blocks:
+            continue
+        with open(path, "rb") as f:
+            for entry in blocks:
+                f.seek(entry["offset"])
+                data = gzip.decompress(f.read(entry["length"]))
+                for line in data.decode("utf-8").splitlines():
+                    record = json.loads(line)
+                    if start_ts <= record["ts"] <= end_ts:
+                        yield record["ts"], record["msg"]
@@ -0,0 +1,153 @@
+import time
+import asyncio
+import ccxt.async_support as ccxt
+from loguru import logger
+
+# === 🔧 价格补充配置 ===
+ENRICH_BUDGET = 0.3  # 价格补充的总时间预算（秒），超时的币种直接不带价格
+PRICE_CACHE_TTL = 5  # 价格缓存时间（秒）
+MAX_TICKERS = 5  # 单条新闻最多补充的币种数量
+WARM_UP_RETRY = 5  # 加载交易对失败后首次重试的间隔（秒），之后指数退避
+WARM_UP_RETRY_MAX = 300
+
+# 与 price_service 相同的交易所优先级
+EXCHANGE_IDS = ["binance", "bybit", "okx", "bitget", "gate", "htx"]  # htx 即原 huobi
+
+
+def format_quote(exchange, symbol, ticker):
+    """与 price_service 一致的价格文案"""
+    change = ticker["percentage"] or 0
+    return (
+        f"${exchange.price_to_precision(symbol, ticker['last'])} "
+        + ("📈" if change >= 0 else "📉")
+        + f" {change:+.2f}% ({exchange.id})"
+    )
+
+
+class PriceEnricher:
+    """
+    为新闻中的币种补充现货/合约价格。
+    交易所按 price_service 的顺序取第一个有该交易对的：先只问上次成功的（或排第一的）交易所，
+    失败了才并发请求其余交易所。整体受 ENRICH_BUDGET 限制，结果短暂缓存，同一币种的并发请求合并为一次。
+    """
+
+    def __init__(self, session=None):
+        # session 为外部共享的 aiohttp.ClientSession 时，ccxt 不再自建连接池
+        config = {"enableRateLimit": False}
+        if session is not None:
+            config["session"] = session
+        self.exchanges = [getattr(ccxt, exchange_id)(config) for exchange_id in EXCHANGE_IDS]
+        self.cache = {}  # symbol -> (过期时间, 文案或 None)
+        self.inflight = {}
+        self.pinned = {}  # symbol -> 上次取到价格的交易所
+
+    async def warm_up(self):
+        """
+        提前加载交易对，避免第一条新闻付出 load_markets 的延迟。
+        只有加载成功的交易所参与报价，失败的按指数退避重试直到成功，全部加载完才返回。
+        """
+        pending, delay, reload = list(self.exchanges), WARM_UP_RETRY, False
+        while True:
+            results = await asyncio.gather(
+                *(ex.load_markets(reload) for ex in pending), return_exceptions=True
+            )
+            failed = []
+            for ex, result in zip(pending, results):
+                if isinstance(result, Exception):
+                    logger.warning(f"[价格] {ex.id} 加载交易对失败: {result}，{delay}s 后重试")
+                    failed.append(ex)
+            if not failed:
+                break
+            pending, reload = failed, True
+            await asyncio.sleep(delay)
+            delay = min(WARM_UP_RETRY_MAX, delay * 2)
+        logger.info("[价格] 交易对预加载完成")
+
+    async def close(self):
+        await asyncio.gather(*(ex.close() for ex in self.exchanges), return_exceptions=True)
+
+    @staticmethod
+    async def _try(exchange, symbol):
+        try:
+            ticker = await exchange.fetch_ticker(symbol)
+        except Exception:
+            return None
+        if ticker.get("last") is None:
+            return None
+        return format_quote(exchange, symbol, ticker)
+
+    async def fetch_first(self, symbol):
+        """
+        先请求固定的交易所，失败后并发请求其余挂牌该交易对的交易所：
+        排在前面的交易所都已失败时，第一个成功的结果立即返回，不等更慢的交易所。
+        """
+        candidates = [ex for ex in self.exchanges if ex.markets and symbol in ex.markets]
+        if not candidates:
+            return None
+        first = self.pinned.get(symbol)
+        if first not in candidates:
+            first = candidates[0]
+        quote = await self._try(first, symbol)
+        if quote is not None:
+            self.pinned[symbol] = first
+            return quote
+        self.pinned.pop(symbol, None)
+
+        rest = [ex for ex in candidates if ex is not first]
+        tasks = [asyncio.ensure_future(self._try(ex, symbol)) for ex in rest]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                await next_done
+                for ex, task in zip(rest, tasks):
+                    if not task.done():
+                        break
+                    if task.result() is not None:
+                        self.pinned[symbol] = ex
+                        return task.result()
+        finally:
+            for task in tasks:
+                task.cancel()
+        return None
+
+    async def quote(self, symbol):
+        now = time.time()
+        cached = self.cache.get(symbol)
+        if cached and cached[0] > now:
+            return cached[1]
+        task = self.inflight.get(symbol)
+        if task is None:
+            task = asyncio.ensure_future(self.fetch_first(symbol))
+            self.inflight[symbol] = task
+            task.add_done_callback(lambda t, s=symbol: self._store(s, t))
+        return await asyncio.shield(task)
+
+    def _store(self, symbol, task):
+        self.inflight.pop(symbol, None)
+        if not task.cancelled() and task.exception() is None:
+            self.cache[symbol] = (time.time() + PRICE_CACHE_TTL, task.result())
+
+    async def enrich(self, tickers, budget=ENRICH_BUDGET):
+        """返回 {币种: {"spot": 文案, "future": 文案}}，预算内没拿到的币种不出现在结果里"""
+        tickers = sorted(tickers)[:MAX_TICKERS]
+        jobs = {}
+        for coin in tickers:
+            jobs[asyncio.ensure_future(self.quote(f"{coin}/USDT"))] = (coin, "spot")
+            jobs[asyncio.ensure_future(self.quote(f"{coin}/USDT:USDT"))] = (coin, "future")
+        if not jobs:
+            return {}
+        done, pending = await asyncio.wait(jobs, timeout=budget)
+        for job in pending:
+            # 只取消等待，底层请求仍在 inflight 中完成并写入缓存
+            job.cancel()
+
+        prices = {}
+        for job in done:
+            if job.exception() is not None or job.result() is None:
+                continue
+            coin, market = jobs[job]
+            prices.setdefault(coin, {})[market] = job.result()
+        if pending:
+            missed = sorted({jobs[j][0] for j in pending} - set(prices))
+            if missed:
+                logger.info(f"[价格] {budget * 1000:.0f}ms 预算内未取到: {missed}")
+        return prices
@@ -1,33 +1,131 @@
-import sys
+import time
+import random
 import asyncio
+from collections import deque
 import websockets
 from loguru import logger
+from common.log import setup_logging
 from datetime import datetime
+from pipeline import NewsPipeline
+from enrich import PriceEnricher
+from archive import NewsArchive
+
+WS_URL = "wss://bwenews-api.bwe-ws.com/ws"
+
+# === 🔧 连接参数 ===
+PING_INTERVAL = 10  # 心跳间隔（秒）
+PING_TIMEOUT = 5  # 心跳超时，超时即判定连接已死并主动断开
+STALL_TIMEOUT = 60  # 超过该时间没有收到任何消息则告警（秒）
+BACKOFF_BASE = 0.5  # 首次重连等待（秒）
+BACKOFF_MAX = 30  # 最大重连等待（秒）
+MAX_MESSAGE_SIZE = 1 * 1024 * 1024  # 单条消息上限（字节）
+MAX_QUEUE = 256  # websockets 内部接收缓冲的消息条数
+
+# 断线记录：(断开时间, 恢复时间, 原因)
+disconnect_gaps = deque(maxlen=1000)
+
+
+def fmt_ts(ts):
+    return datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+def backoff_delay(attempt):
+    """指数退避 + 全抖动"""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * (2**attempt)))
+
+
+async def watch_stall(ws, state):
+    """应用层活性检测：长时间没有消息时先告警，再发一次 ping 确认连接是否还活着"""
+    while True:
+        await asyncio.sleep(STALL_TIMEOUT / 4)
+        idle = time.time() - state["last_message"]
+        if idle < STALL_TIMEOUT:
+            continue
+        logger.warning(f"⚠️ 已 {idle:.0f}s 未收到消息，检测连接活性...")
+        try:
+            pong = await ws.ping()
+            t0 = time.time()
+            await asyncio.wait_for(pong, PING_TIMEOUT)
+            logger.info(f"💓 连接仍存活，pong 延迟 {(time.time() - t0) * 1000:.0f}ms")
+            state["last_message"] = time.time()
+        except Exception:
+            logger.error("❌ 心跳无响应，判定连接停滞，主动断开")
+            await ws.close()
+            return
+
+
+async def listen(pipeline, archive=None):
+    attempt = 0
+    gap_start = None
+    gap_reason = None
+    while True:
+        try:
+            async with websockets.connect(
+                WS_URL,
+                ping_interval=PING_INTERVAL,
+                ping_timeout=PING_TIMEOUT,
+                close_timeout=2,
+                compression=None,  # 新闻消息很小，关闭 permessage-deflate 省去解压开销
+                max_size=MAX_MESSAGE_SIZE,
+                max_queue=MAX_QUEUE,
+            ) as ws:
+                logger.info("✅ 已连接 WebSocket")
+                if gap_start is not None:
+                    gap_end = time.time()
+                    disconnect_gaps.append((gap_start, gap_end, gap_reason))
+                    logger.warning(
+                        f"⏱️ 断线区间 {fmt_ts(gap_start)} ~ {fmt_ts(gap_end)}，"
+                        f"共 {gap_end - gap_start:.3f}s（原因: {gap_reason}）"
+                    )
+                    gap_start = None
+                state = {"last_message": time.time()}
+                watchdog = asyncio.create_task(watch_stall(ws, state))
+                try:
+                    async for message in ws:
+                        # 记录接收消息时的时间，处理交给流水线，接收循环只负责入队
+                        state["last_message"] = time.time()
+                        if archive is not None:
+                            archive.append(state["last_message"], message)
+                        pipeline.submit(message, state["last_message"])
+                        # 收到过消息才算连接稳定，重置退避计数
+                        attempt = 0
+                finally:
+                    watchdog.cancel()
+                # 迭代正常结束说明服务端主动关闭了连接
+                raise ConnectionError("服务端关闭连接")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            if gap_start is None:
+                gap_start = time.time()
+                gap_reason = repr(e)
+            delay = backoff_delay(attempt)
+            attempt += 1
+            logger.error(f"❌ 连接断开: {e!r}，{delay:.2f}s 后第 {attempt} 次重连...")
+            await asyncio.sleep(delay)
+
+
+ENRICH_PRICES = True  # 命中币种时补充实时价格
+ARCHIVE_MESSAGES = True  # 原始消息写入压缩归档，供回放/回测
+
+
+async def main():
+    enricher = PriceEnricher() if ENRICH_PRICES else None
+    archive = NewsArchive() if ARCHIVE_MESSAGES else None
+    pipeline = NewsPipeline(enricher=enricher)
+    tasks = [listen(pipeline, archive), pipeline.run(), pipeline.report()]
+    if archive is not None:
+        tasks.append(archive.run())
+    if enricher is not None:
+        tasks.append(enricher.warm_up())
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        if enricher is not None:
+            await enricher.close()
 
-# 配置日志
-logger.remove()
-logger.add(
-    sys.stdout,
-    level="INFO",
-    format="<green>{time:YYYY-MM-DD HH:mm:ss.SSS}</green> | "
-           "<level>{level: <8}</level> | "
-           "<cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - "
-           "<level>{message}</level>",
-)
-
-async def listen():
-    url = "wss://bwenews-api.bwe-ws.com/ws"
-    async with websockets.connect(url) as ws:
-        logger.info("✅ 已连接 WebSocket")
-        while True:
-            try:
-                message = await ws.recv()
-                # 记录接收消息时的时间（带毫秒）
-                now = datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
-                logger.info(f"📩 [{now}] 收到消息: {message}")
-            except websockets.ConnectionClosed:
-                logger.error("❌ 连接关闭，尝试重连...")
-                break
 
 if __name__ == "__main__":
-    asyncio.run(listen())
+    # 只在独立运行时配置日志，被 runner / bench 导入时由它们统一配置
+    setup_logging("bwenews")
+    asyncio.run(main())
@@ -0,0 +1,358 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+from datetime import datetime
+from collections import deque, OrderedDict
+import aiohttp
+from loguru import logger
+from common.stats import percentile
+
+# === 🔧 处理流水线配置 ===
+QUEUE_SIZE = 1000  # 接收 -> 处理 之间的有界队列长度，满了丢弃最旧的消息
+DEDUP_SIZE = 10000  # 内容去重窗口（条）
+STATS_INTERVAL = 300  # 统计信息输出间隔（秒）
+SINKS = ["log"]  # 命中后的输出：log / telegram
+TICKERS_FILE = "tickers.txt"  # 每行一个币种代码，不存在则使用 DEFAULT_TICKERS
+KEYWORDS_FILE = "keywords.txt"  # 每行一个关键词，可写成 "关键词,标签"
+DEFAULT_TICKERS = ["BTC", "ETH", "SOL", "BNB", "XRP", "DOGE", "ADA", "TRX", "TON", "SUI"]
+# 英文关键词按整词匹配，常见变形单独列出并归到同一个标签
+DEFAULT_KEYWORDS = [
+    "listing",
+    "delist",
+    "delisting,delist",
+    "delisted,delist",
+    "hack",
+    "hacked,hack",
+    "exploit",
+    "exploited,exploit",
+    "etf",
+    "上线",
+    "下架",
+    "被盗",
+]
+
+# === Telegram Bot 配置 ===
+TELEGRAM_TOKEN = ""  # 替换为你的
+TELEGRAM_CHAT_ID = ""  # 替换为你的 Chat ID
+TELEGRAM_TIMEOUT = 10  # 单次发送的总超时（秒）
+TELEGRAM_QUEUE_SIZE = 100  # 待发送消息上限，满了丢弃最旧的
+
+
+class AhoCorasick:
+    """多模式匹配自动机：一次扫描文本即可找出所有命中的模式，ignore_case=False 时区分大小写"""
+
+    def __init__(self, ignore_case=True):
+        self.ignore_case = ignore_case
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]  # 每个状态结束的 (模式长度, 值, 是否整词匹配)
+
+    def add(self, pattern, value, whole_word=False):
+        state = 0
+        for ch in pattern.lower() if self.ignore_case else pattern:
+            nxt = self.goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self.goto)
+                self.goto[state][ch] = nxt
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = nxt
+        self.output[state].append((len(pattern), value, whole_word))
+
+    def build(self):
+        """BFS 构建失败指针，并把失败链上的输出合并到当前状态"""
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in self.goto[state].items():
+                queue.append(nxt)
+                f = self.fail[state]
+                while f and ch not in self.goto[f]:
+                    f = self.fail[f]
+                self.fail[nxt] = self.goto[f].get(ch, 0)
+                self.output[nxt] = self.output[nxt] + self.output[self.fail[nxt]]
+        return self
+
+    def find(self, text):
+        """返回命中的值集合；整词模式要求前后不是字母数字"""
+        if self.ignore_case:
+            text = text.lower()
+        n = len(text)
+        goto, fail, output = self.goto, self.fail, self.output
+        state = 0
+        found = set()
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if not output[state]:
+                continue
+            for length, value, whole_word in output[state]:
+                if whole_word:
+                    start = i - length + 1
+                    if start > 0 and text[start - 1].isascii() and text[start - 1].isalnum():
+                        continue
+                    if i + 1 < n and text[i + 1].isascii() and text[i + 1].isalnum():
+                        continue
+                found.add(value)
+        return found
+
+
+def read_lines(path):
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+class MatcherGroup:
+    """多个自动机各扫一遍，合并命中结果"""
+
+    def __init__(self, *matchers):
+        self.matchers = matchers
+
+    def find(self, text):
+        found = set()
+        for matcher in self.matchers:
+            found |= matcher.find(text)
+        return found
+
+
+def build_matcher():
+    """
+    从文件加载币种和关键词，构建自动机。
+    币种区分大小写：只匹配全大写的整词（TON）或带 $ 前缀（$TON / $ton），
+    避免 "a ton of"、"Sui Generis" 之类的普通单词误命中；关键词不区分大小写，
+    英文关键词同样按整词匹配（etf 不命中 Netflix，listing 不命中 delisting），中文关键词按子串匹配。
+    """
+    tickers = read_lines(TICKERS_FILE) or DEFAULT_TICKERS
+    keywords = read_lines(KEYWORDS_FILE) or DEFAULT_KEYWORDS
+    ticker_matcher = AhoCorasick(ignore_case=False)
+    keyword_matcher = AhoCorasick(ignore_case=True)
+    for ticker in tickers:
+        ticker = ticker.upper()
+        ticker_matcher.add(ticker, ("ticker", ticker), whole_word=True)
+        keyword_matcher.add(f"${ticker}", ("ticker", ticker), whole_word=True)
+    for line in keywords:
+        keyword, _, tag = line.partition(",")
+        keyword = keyword.strip()
+        keyword_matcher.add(
+            keyword, ("keyword", tag.strip() or keyword), whole_word=keyword.isascii()
+        )
+    logger.info(f"[流水线] 已加载 {len(tickers)} 个币种、{len(keywords)} 个关键词")
+    return MatcherGroup(ticker_matcher.build(), keyword_matcher.build())
+
+
+def parse_message(raw):
+    """消息只解析一次，非 JSON 消息整体当作标题"""
+    try:
+        data = json.loads(raw)
+    except (TypeError, ValueError):
+        data = None
+    if not isinstance(data, dict):
+        return {"title": str(raw), "coins": [], "url": "", "raw": raw}
+    return {
+        "title": data.get("news_title") or data.get("title") or "",
+        "coins": data.get("coins_included") or [],
+        "url": data.get("url") or "",
+        "source": data.get("source_name", ""),
+        "raw": raw,
+    }
+
+
+class StageStats:
+    """单个阶段的耗时采样"""
+
+    def __init__(self):
+        self.samples = deque(maxlen=2000)
+        self.count = 0
+
+    def add(self, seconds):
+        self.samples.append(seconds)
+        self.count += 1
+
+    def summary(self):
+        return (
+            f"n={self.count} p50={percentile(self.samples, 0.5) * 1e3:.3f}ms "
+            f"p99={percentile(self.samples, 0.99) * 1e3:.3f}ms"
+        )
+
+
+def format_prices(event):
+    """把补充的价格拼成多行文案"""
+    lines = []
+    for coin, quotes in sorted(event.get("prices", {}).items()):
+        parts = []
+        if quotes.get("spot"):
+            parts.append(f"现货: {quotes['spot']}")
+        if quotes.get("future"):
+            parts.append(f"合约: {quotes['future']}")
+        lines.append(f"{coin} " + " | ".join(parts))
+    return "\n".join(lines)
+
+
+async def log_sink(event):
+    logger.info(
+        f"🎯 命中 {sorted(event['tickers'])} {sorted(event['keywords'])}: {event['title']}"
+    )
+    prices = format_prices(event)
+    if prices:
+        logger.info(f"💹 {prices}")
+
+
+def format_telegram(event):
+    tickers = " ".join(f"${t}" for t in sorted(event["tickers"]))
+    return f"📰 {event['title']}\n{tickers}\n{format_prices(event)}\n{event['url']}".strip()
+
+
+class TelegramSender:
+    """
+    后台发送队列：sink 只做入队，由一个后台任务用共享的 ClientSession 逐条发送，
+    Telegram 变慢或超时不会拖住处理流水线。第一次 send() 时在当前事件循环中启动。
+    """
+
+    def __init__(self, queue_size=TELEGRAM_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.queue = None
+        self.task = None
+        self.dropped = 0
+
+    def send(self, text):
+        if self.task is None:
+            self.queue = asyncio.Queue(maxsize=self.queue_size)
+            self.task = asyncio.ensure_future(self._run())
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(text)
+
+    async def _run(self):
+        timeout = aiohttp.ClientTimeout(total=TELEGRAM_TIMEOUT)
+        async with aiohttp.ClientSession(timeout=timeout) as session:
+            while True:
+                text = await self.queue.get()
+                await self._post(session, text)
+
+    @staticmethod
+    async def _post(session, text):
+        url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
+        payload = {"chat_id": TELEGRAM_CHAT_ID, "text": text, "disable_web_page_preview": True}
+        try:
+            async with session.post(url, data=payload) as response:
+                if response.status != 200:
+                    logger.error(f"❗ Telegram 发送失败: {await response.text()}")
+        except Exception as e:
+            logger.error(f"❗ Telegram 请求异常: {e}")
+
+
+telegram_sender = TelegramSender()
+
+
+async def telegram_sink(event):
+    telegram_sender.send(format_telegram(event))
+
+
+SINK_REGISTRY = {"log": log_sink, "telegram": telegram_sink}
+
+
+class NewsPipeline:
+    """
+    接收与处理解耦：submit() 只做入队，不会阻塞 ws.recv()；
+    后台任务负责解析、去重、匹配并分发到各个 sink。
+    """
+
+    def __init__(self, sinks=None, queue_size=QUEUE_SIZE, enricher=None):
+        self.enricher = enricher
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.matcher = build_matcher()
+        self.sinks = [SINK_REGISTRY[name] for name in (sinks or SINKS)]
+        self.seen = OrderedDict()
+        self.dropped = 0
+        self.duplicates = 0
+        self.max_depth = 0
+        self.stats = {
+            name: StageStats() for name in ("submit", "queue_wait", "parse", "match", "enrich", "sink")
+        }
+
+    def submit(self, raw, recv_ts=None):
+        """接收路径调用：O(1) 入队，队列满时丢弃最旧的消息"""
+        t0 = time.perf_counter()
+        item = (raw, recv_ts or time.time(), t0)
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.queue.task_done()
+            self.dropped += 1
+        self.queue.put_nowait(item)
+        self.max_depth = max(self.max_depth, self.queue.qsize())
+        self.stats["submit"].add(time.perf_counter() - t0)
+
+    def is_duplicate(self, event):
+        digest = hashlib.blake2b(
+            (event["title"] or event["raw"]).strip().encode("utf-8"), digest_size=16
+        ).digest()
+        if digest in self.seen:
+            self.seen.move_to_end(digest)
+            return True
+        self.seen[digest] = None
+        if len(self.seen) > DEDUP_SIZE:
+            self.seen.popitem(last=False)
+        return False
+
+    async def process(self, raw, recv_ts):
+        now = datetime.fromtimestamp(recv_ts).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        logger.info(f"📩 [{now}] 收到消息: {raw}")
+        t0 = time.perf_counter()
+        event = parse_message(raw)
+        event["recv_ts"] = recv_ts
+        t1 = time.perf_counter()
+        self.stats["parse"].add(t1 - t0)
+        if self.is_duplicate(event):
+            self.duplicates += 1
+            return None
+
+        hits = self.matcher.find(event["title"])
+        event["tickers"] = {v for k, v in hits if k == "ticker"}
+        event["tickers"].update(c.upper() for c in event["coins"])
+        event["keywords"] = {v for k, v in hits if k == "keyword"}
+        t2 = time.perf_counter()
+        self.stats["match"].add(t2 - t1)
+
+        if event["tickers"] and self.enricher is not None:
+            event["prices"] = await self.enricher.enrich(event["tickers"])
+            t3 = time.perf_counter()
+            self.stats["enrich"].add(t3 - t2)
+            t2 = t3
+
+        if event["tickers"] or event["keywords"]:
+            for sink in self.sinks:
+                try:
+                    await sink(event)
+                except Exception as e:
+                    logger.error(f"[流水线] sink {sink.__name__} 异常: {e}")
+            self.stats["sink"].add(time.perf_counter() - t2)
+        return event
+
+    async def run(self):
+        while True:
+            raw, recv_ts, enqueued = await self.queue.get()
+            self.stats["queue_wait"].add(time.perf_counter() - enqueued)
+            try:
+                await self.process(raw, recv_ts)
+            except Exception as e:
+                logger.error(f"[流水线] 处理消息异常: {e}")
+            finally:
+                self.queue.task_done()
+
+    async def report(self):
+        while True:
+            await asyncio.sleep(STATS_INTERVAL)
+            logger.info(
+                f"[流水线] 队列深度 当前={self.queue.qsize()} 峰值={self.max_depth} "
+                f"丢弃={self.dropped} 重复={self.duplicates}"
+            )
+            for name, stats in self.stats.items():
+                logger.info(f"[流水线]   {name:<10} {stats.summary()}")
+            self.max_depth = self.queue.qsize()
@@ -0,0 +1,7 @@
+"""
+各服务共用的模块。容器内与服务代码同在 /app 下，直接 import common 即可；
+本地从服务目录运行时把仓库根目录加入 PYTHONPATH，例如：
+
+    PYTHONPATH=. python ys_monitor/ys.py
+    cd price_service && PYTHONPATH=.. uvicorn price_service:app
+"""
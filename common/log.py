@@ -0,0 +1,248 @@
+"""
+各服务共用的日志配置：loguru 只负责把记录交给一个有界队列，
+格式化（紧凑 JSON）、写文件、按大小/时间轮转和压缩都在后台线程完成，
+请求/接收路径上的日志开销只剩一次入队。
+
+    from common.log import setup_logging
+    setup_logging("price_service", level="DEBUG", sample_rates={"DEBUG": 0.05})
+
+    with logger.contextualize(request=request_id):  # 该请求的 DEBUG 日志整体保留或整体丢弃
+        ...
+"""
+import os
+import sys
+import json
+import zlib
+import gzip
+import time
+import queue
+import atexit
+import shutil
+import threading
+import traceback
+from datetime import datetime
+from loguru import logger
+
+LOG_DIR = "logs"  # 容器内即 /app/logs，对应 docker-compose 挂载的日志目录
+QUEUE_SIZE = 10000  # 队列满时直接丢弃，绝不阻塞调用方
+ROTATE_BYTES = 50 * 1024 * 1024  # 单个日志文件上限（字节）
+ROTATE_SECONDS = 24 * 3600  # 单个日志文件最长时间跨度（秒）
+BACKUP_COUNT = 14  # 保留的已轮转文件数量
+STATS_INTERVAL = 300  # 日志系统自身统计的输出间隔（秒）
+SAMPLE_KEY = "request"  # 按该 extra 字段整体采样
+
+
+class LevelSampler:
+    """
+    按级别采样：rate=0.05 表示该级别保留约 1/20。
+    带 extra[SAMPLE_KEY] 的记录按请求采样（同一请求的该级别日志要么全留要么全丢，耗时链路完整），
+    其余记录按计数每 20 条保留 1 条，都不用随机数。
+    """
+
+    def __init__(self, sample_rates):
+        self.every = {
+            level: max(1, round(1 / rate)) for level, rate in (sample_rates or {}).items() if rate > 0
+        }
+        self.muted = {level for level, rate in (sample_rates or {}).items() if rate <= 0}
+        self.counters = {level: 0 for level in self.every}
+        self.sampled_out = 0
+
+    def __call__(self, record):
+        level = record["level"].name
+        if level in self.muted:
+            self.sampled_out += 1
+            return False
+        every = self.every.get(level)
+        if every is None or every == 1:
+            return True
+        key = record["extra"].get(SAMPLE_KEY)
+        if key is not None:
+            keep = zlib.crc32(str(key).encode("utf-8")) % every == 0
+        else:
+            self.counters[level] += 1
+            keep = self.counters[level] % every == 0
+        if not keep:
+            self.sampled_out += 1
+        return keep
+
+
+class RotatingWriter:
+    """按大小/时间轮转的文件写入，轮转后的文件 gzip 压缩，只在后台线程中使用"""
+
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+        self.opened_at = 0
+        self.size = 0
+
+    def _open(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        self.file = open(self.path, "a", encoding="utf-8")
+        self.size = self.file.tell()
+        self.opened_at = time.time()
+
+    def _rotate(self):
+        self.file.close()
+        stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+        base, ext = os.path.splitext(self.path)
+        rotated = f"{base}.{stamp}{ext}.gz"
+        with open(self.path, "rb") as src, gzip.open(rotated, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        os.remove(self.path)
+        prefix = os.path.basename(base) + "."
+        directory = os.path.dirname(self.path) or "."
+        backups = sorted(
+            name for name in os.listdir(directory) if name.startswith(prefix) and name.endswith(".gz")
+        )
+        for name in backups[:-BACKUP_COUNT]:
+            os.remove(os.path.join(directory, name))
+        self._open()
+
+    def write(self, line):
+        if self.file is None:
+            self._open()
+        elif self.size >= ROTATE_BYTES or time.time() - self.opened_at >= ROTATE_SECONDS:
+            self._rotate()
+        self.file.write(line)
+        self.size += len(line)
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+
+class QueueSink:
+    """loguru sink：调用方只做一次 put_nowait，其余工作交给后台线程"""
+
+    def __init__(self, service, path, console=True):
+        self.service = service
+        self.queue = queue.Queue(maxsize=QUEUE_SIZE)
+        self.writer = RotatingWriter(path) if path else None
+        self.console = console
+        self.emitted = 0
+        self.dropped = 0
+        self.enqueue_time = 0.0
+        self.sampler = None
+        self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+        self.thread.start()
+
+    def __call__(self, message):
+        t0 = time.perf_counter()
+        record = message.record
+        item = (
+            record["time"].timestamp(),
+            record["level"].name,
+            record["name"],
+            record["function"],
+            record["line"],
+            record["message"],
+            record["extra"] or None,
+            record["exception"],
+        )
+        try:
+            self.queue.put_nowait(item)
+            self.emitted += 1
+        except queue.Full:
+            self.dropped += 1
+        self.enqueue_time += time.perf_counter() - t0
+
+    def stats(self):
+        emitted = self.emitted or 1
+        return {
+            "emitted": self.emitted,
+            "dropped": self.dropped,
+            "sampled_out": self.sampler.sampled_out if self.sampler else 0,
+            "queue_depth": self.queue.qsize(),
+            "avg_enqueue_us": self.enqueue_time / emitted * 1e6,
+        }
+
+    def _format(self, item):
+        ts, level, name, function, line, text, extra, exception = item
+        record = {
+            "t": round(ts, 3),
+            "l": level,
+            "s": self.service,
+            "at": f"{name}:{function}:{line}",
+            "m": text,
+        }
+        if extra:
+            record["x"] = extra
+        if exception is not None:
+            record["exc"] = "".join(traceback.format_exception(*exception)).rstrip()
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":"), default=str) + "\n"
+
+    def _console(self, item):
+        ts, level, name, function, line, text, _, exception = item
+        when = datetime.fromtimestamp(ts).strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+        out = f"{when} | {level: <8} | {name}:{function}:{line} - {text}\n"
+        if exception is not None:
+            out += "".join(traceback.format_exception(*exception))
+        return out
+
+    def _run(self):
+        next_stats = time.time() + STATS_INTERVAL
+        while True:
+            try:
+                item = self.queue.get(timeout=1)
+            except queue.Empty:
+                item = None
+            batch = [] if item is None else [item]
+            # 一次取完队列里积压的记录，批量写入
+            while batch and len(batch) < 1000:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            for entry in batch:
+                if entry is StopIteration:
+                    self._flush()
+                    return
+                try:
+                    if self.writer is not None:
+                        self.writer.write(self._format(entry))
+                    if self.console:
+                        sys.stdout.write(self._console(entry))
+                except Exception as e:
+                    sys.stderr.write(f"日志写入失败: {e}\n")
+            self._flush()
+            if time.time() >= next_stats:
+                next_stats = time.time() + STATS_INTERVAL
+                logger.info("[日志] 统计 {}", self.stats())
+
+    def _flush(self):
+        if self.writer is not None:
+            self.writer.flush()
+        if self.console:
+            sys.stdout.flush()
+
+    def close(self):
+        try:
+            self.queue.put(StopIteration, timeout=1)
+        except queue.Full:
+            return
+        self.thread.join(timeout=5)
+
+
+_sink = None
+
+
+def setup_logging(service, level="INFO", log_dir=LOG_DIR, console=True, sample_rates=None):
+    """
+    替换 loguru 默认输出：后台线程写 stdout 和 {log_dir}/{service}.jsonl。
+    sample_rates 形如 {"DEBUG": 0.05}，用于高频的计时日志。
+    """
+    global _sink
+    logger.remove()
+    if _sink is not None:
+        _sink.close()
+    path = os.path.join(log_dir, f"{service}.jsonl") if log_dir else None
+    _sink = QueueSink(service, path, console=console)
+    _sink.sampler = LevelSampler(sample_rates)
+    logger.add(_sink, level=level, format="{message}", filter=_sink.sampler, catch=False)
+    atexit.register(_sink.close)
+    return _sink
+
+
+def log_stats():
+    """日志系统自身的计数：入队条数、丢弃条数、采样丢弃条数、平均入队耗时"""
+    return _sink.stats() if _sink is not None else {}
@@ -0,0 +1,9 @@
+"""各服务统计耗时分布共用的小工具"""
+
+
+def percentile(samples, q):
+    """最近邻分位数，samples 为空时返回 0.0"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * q))]
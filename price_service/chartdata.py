@@ -0,0 +1,90 @@
+"""
+K线数据模式：不经过 matplotlib，直接返回列式的 OHLCV + 均线 + 统计值，由客户端自行绘图。
+
+列按 COLUMNS 顺序存成一个 float64 小端序的连续块（列主序，每列 rows 个值），
+时间戳为毫秒（UTC），均线前 period-1 根为 NaN。JSON 模式下块做 base64，
+msgpack 模式下直接是二进制；compress=true 时块先经过 zlib。
+"""
+import zlib
+import base64
+import numpy as np
+from markets import store as market_store
+from indicators import moving_average
+
+try:
+    import msgpack
+except ImportError:  # 只有 format=msgpack 需要
+    msgpack = None
+
+COLUMNS = ["ts", "open", "high", "low", "close", "volume"]
+DTYPE = "<f8"
+FORMATS = ("image", "data", "msgpack")
+
+
+def build_chart_data(exchange, symbol, timeframe, candles, limit, ma_periods):
+    """K线数组 -> 数据模式的图表内容（块保持未压缩的原始字节，序列化时再按请求处理）"""
+    if len(candles) == 0:
+        return None
+    close = candles[:, 4]
+    mas = [moving_average(close, period)[-limit:] for period in ma_periods]
+    shown = candles[-limit:]
+    block = np.vstack([shown.T, *mas]).astype(DTYPE)
+
+    high = float(shown[:, 2].max())
+    low = float(shown[:, 3].min())
+    now = float(shown[-1, 4])
+    to_precision = market_store.formatter(exchange, symbol)
+    return {
+        "symbol": symbol,
+        "exchange": exchange.id,
+        "timeframe": timeframe,
+        "rows": len(shown),
+        "columns": COLUMNS + [f"ma{period}" for period in ma_periods],
+        "dtype": DTYPE,
+        "stats": {
+            "high": high,
+            "low": low,
+            "now": now,
+            "high_str": to_precision(high),
+            "low_str": to_precision(low),
+            "now_str": to_precision(now),
+        },
+        "data": block.tobytes(),
+    }
+
+
+def _encode_chart(chart, binary, compress):
+    data = chart["data"]
+    if compress:
+        data = zlib.compress(data, 6)
+    return {
+        **chart,
+        "encoding": "zlib" if compress else "raw",
+        "data": data if binary else base64.b64encode(data).decode("ascii"),
+    }
+
+
+def serialize(content, fmt, compress=False):
+    """返回 (body, media_type)；content["charts"] 为 {timeframe: chart}"""
+    binary = fmt == "msgpack"
+    charts = {
+        tf: _encode_chart(chart, binary, compress)
+        for tf, chart in (content.get("charts") or {}).items()
+    }
+    payload = {**content, "charts": charts}
+    if binary:
+        if msgpack is None:
+            raise RuntimeError("未安装 msgpack")
+        return msgpack.packb(payload, use_bin_type=True), "application/msgpack"
+    return payload, "application/json"
+
+
+def decode_block(chart):
+    """客户端参考实现：还原成 {列名: ndarray}"""
+    data = chart["data"]
+    if isinstance(data, str):
+        data = base64.b64decode(data)
+    if chart["encoding"] == "zlib":
+        data = zlib.decompress(data)
+    block = np.frombuffer(data, dtype=chart["dtype"]).reshape(len(chart["columns"]), -1)
+    return dict(zip(chart["columns"], block))
@@ -0,0 +1,138 @@
+"""
+批量指标引擎：多个币种的K线按时间对齐成 (币种数, K线数) 的二维数组，
+均线、均线交叉、高低区间、成交量 z-score 对整个币种池一次向量化计算。
+缺失的K线为 NaN，窗口内有 NaN 的指标同样为 NaN（与 pandas rolling 默认行为一致）；
+高低区间例外，只在窗口内全部缺失时为 NaN，个别K线缺失不影响。
+
+    python indicators.py   # 合成数据测速
+"""
+import time
+import warnings
+import numpy as np
+import resample
+
+FIELDS = ("open", "high", "low", "close", "volume")
+
+
+class CandleBlock:
+    """symbols: [str]，ts: (T,) 毫秒时间戳，以及 open/high/low/close/volume 各一个 (S, T) 数组"""
+
+    def __init__(self, symbols, ts, arrays):
+        self.symbols = symbols
+        self.ts = ts
+        for name, array in zip(FIELDS, arrays):
+            setattr(self, name, array)
+
+    @classmethod
+    def align(cls, candles_by_symbol, timeframe, length):
+        """
+        {symbol: ndarray[n, 6]} -> 以最新一根K线为终点、长度为 length 的等间隔网格，
+        一次 scatter 写入；停更或缺失的K线留 NaN。1M 周期不等长，不支持。
+        """
+        tf_ms = resample.timeframe_ms(timeframe)
+        if tf_ms is None:
+            raise ValueError(f"不支持的周期: {timeframe}")
+        symbols = [s for s, c in candles_by_symbol.items() if len(c)]
+        block = np.full((len(FIELDS), len(symbols), length), np.nan)
+        if not symbols:
+            return cls(symbols, np.empty(0, dtype=np.int64), list(block))
+
+        chunks = [candles_by_symbol[s] for s in symbols]
+        rows = np.repeat(np.arange(len(symbols)), [len(c) for c in chunks])
+        stacked = np.concatenate(chunks)
+        ts = resample.align(stacked[:, 0].astype(np.int64), timeframe)
+        end = ts.max()
+        cols = (ts - end) // tf_ms + length - 1
+        keep = cols >= 0
+        block[:, rows[keep], cols[keep]] = stacked[keep, 1:].T
+        grid = end - np.arange(length - 1, -1, -1, dtype=np.int64) * tf_ms
+        return cls(symbols, grid, list(block))
+
+
+def moving_average(values, period):
+    """沿最后一维的简单均线，前 period-1 个及窗口内有 NaN 的位置为 NaN"""
+    values = np.asarray(values, dtype=np.float64)
+    out = np.full(values.shape, np.nan)
+    if values.shape[-1] < period:
+        return out
+    missing = np.isnan(values)
+    pad = [(0, 0)] * (values.ndim - 1) + [(1, 0)]
+    csum = np.pad(np.cumsum(np.where(missing, 0.0, values), axis=-1), pad)
+    cnan = np.pad(np.cumsum(missing, axis=-1), pad)
+    window_sum = csum[..., period:] - csum[..., :-period]
+    window_nan = cnan[..., period:] - cnan[..., :-period]
+    out[..., period - 1 :] = np.where(window_nan > 0, np.nan, window_sum / period)
+    return out
+
+
+def crossover(fast, slow, lookback=1):
+    """
+    最近 lookback 根内的最后一次交叉：1 金叉（fast 上穿 slow），-1 死叉，0 无交叉。
+    返回 (方向, 距今K线数)，无交叉时距今为 -1。
+    """
+    diff = np.sign(fast - slow)
+    prev, curr = diff[:, -lookback - 1 : -1], diff[:, -lookback:]
+    events = np.where((prev <= 0) & (curr > 0), 1, np.where((prev >= 0) & (curr < 0), -1, 0))
+    has_event = events != 0
+    # 取最后一个非零位置
+    last = lookback - 1 - np.argmax(has_event[:, ::-1], axis=1)
+    any_event = has_event.any(axis=1)
+    direction = np.where(any_event, events[np.arange(len(events)), last], 0)
+    bars_ago = np.where(any_event, lookback - 1 - last, -1)
+    return direction, bars_ago
+
+
+def high_low_range(block, window):
+    """最近 window 根（跳过缺失的K线）的最高、最低、区间幅度（%）和收盘价在区间中的位置（0~1）"""
+    with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+        # 整行缺失时 nanmax / nanmin 返回 NaN 并告警，这里按 NaN 处理即可
+        warnings.simplefilter("ignore", RuntimeWarning)
+        high = np.nanmax(block.high[:, -window:], axis=1)
+        low = np.nanmin(block.low[:, -window:], axis=1)
+        close = block.close[:, -1]
+        return high, low, (high - low) / low * 100, (close - low) / (high - low)
+
+
+def volume_zscore(volume, window):
+    """最新一根成交量相对之前 window 根的 z-score"""
+    history = volume[:, -window - 1 : -1]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = history.mean(axis=1)
+        std = history.std(axis=1)
+        return np.where(std > 0, (volume[:, -1] - mean) / std, np.nan)
+
+
+def compute(block, ma_periods, range_window, volume_window, cross_lookback):
+    """整个币种池的指标，返回 {名称: (S,) 数组}"""
+    result = {"close": block.close[:, -1]}
+    mas = {period: moving_average(block.close, period) for period in ma_periods}
+    for period, ma in mas.items():
+        result[f"ma{period}"] = ma[:, -1]
+    for fast, slow in zip(ma_periods, ma_periods[1:]):
+        direction, bars_ago = crossover(mas[fast], mas[slow], cross_lookback)
+        result[f"cross_{fast}_{slow}"] = direction
+        result[f"cross_{fast}_{slow}_bars"] = bars_ago
+    high, low, range_pct, position = high_low_range(block, range_window)
+    result.update(high=high, low=low, range_pct=range_pct, position=position)
+    result["volume_z"] = volume_zscore(block.volume, volume_window)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result["change_pct"] = (block.close[:, -1] / block.open[:, -range_window] - 1) * 100
+    return result
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    length, tf_ms = 138, 15 * 60 * 1000
+    end = int(time.time() * 1000) // tf_ms * tf_ms
+    for n in (100, 1000, 3000):
+        universe = {}
+        for i in range(n):
+            ts = end - np.arange(length - 1, -1, -1) * tf_ms
+            close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, length)))
+            universe[f"C{i}"] = np.c_[ts, close, close * 1.01, close * 0.99, close, rng.random(length)]
+        t0 = time.perf_counter()
+        candle_block = CandleBlock.align(universe, "15m", length)
+        t1 = time.perf_counter()
+        compute(candle_block, (6, 12, 42), 96, 20, 3)
+        t2 = time.perf_counter()
+        print(f"{n:5d} 个币种: 对齐 {(t1 - t0) * 1e3:6.1f}ms，指标 {(t2 - t1) * 1e3:6.1f}ms")
@@ -0,0 +1,271 @@
+"""
+精简的交易对元数据：只保留 USDT 现货 / USDT 永续的上架信息和价格精度，
+存成一张按 "交易所|交易对" 排序的 numpy 结构化数组，写到 MARKETS_FILE 后各 worker 以只读 mmap 共享。
+同时把各 ccxt 实例的 markets 裁剪到这两类交易对，并提供不经过 ccxt 字符串运算的快速价格格式化。
+
+    python markets.py               # 实际加载各交易所，输出内存占用与格式化吞吐对比
+    python markets.py --synthetic   # 离线：用合成的交易对测量
+"""
+import os
+import sys
+import math
+import time
+import tempfile
+from decimal import Decimal
+import numpy as np
+import ccxt
+from loguru import logger
+
+# === 🔧 元数据配置 ===
+MARKETS_FILE = os.environ.get(
+    "MARKETS_FILE", os.path.join(tempfile.gettempdir(), "price_service_markets.npy")
+)
+MAX_AGE = 6 * 3600  # 共享文件超过该时间由下一个加载完交易对的 worker 重写（秒）
+QUOTE = "USDT"
+
+SPOT, SWAP = 0, 1
+DTYPE = np.dtype(
+    [
+        ("key", "S48"),  # "binance|BTC/USDT"，排序后用于二分查找
+        ("base", "S16"),
+        ("type", "u1"),
+        ("decimals", "i1"),  # 格式化保留的小数位，-1 表示无法快速格式化（交给 ccxt）
+        ("tick", "<f8"),
+    ]
+)
+
+
+def is_kept(market):
+    """只保留 USDT 现货和 USDT 结算的永续"""
+    if market.get("quote") != QUOTE:
+        return False
+    if market.get("spot"):
+        return True
+    return bool(market.get("swap")) and market.get("settle") == QUOTE
+
+
+def price_rule(exchange, market):
+    """(tick, decimals)：把 ccxt 的几种精度模式统一成最小变动价位 + 小数位数"""
+    precision = (market.get("precision") or {}).get("price")
+    if precision is None:
+        return 0.0, -1
+    if exchange.precisionMode == ccxt.TICK_SIZE:
+        exponent = Decimal(str(precision)).normalize().as_tuple().exponent
+        return float(precision), max(0, -exponent)
+    if exchange.precisionMode == ccxt.DECIMAL_PLACES:
+        return 10.0 ** -int(precision), int(precision)
+    return 0.0, -1
+
+
+def extract(exchanges):
+    rows = []
+    for exchange in exchanges:
+        for symbol, market in (exchange.markets or {}).items():
+            if not is_kept(market):
+                continue
+            tick, decimals = price_rule(exchange, market)
+            rows.append(
+                (
+                    f"{exchange.id}|{symbol}".encode(),
+                    market["base"].encode()[:16],
+                    SPOT if market.get("spot") else SWAP,
+                    decimals,
+                    tick,
+                )
+            )
+    table = np.array(rows, dtype=DTYPE)
+    table.sort(order="key")
+    return table
+
+
+def prune_markets(exchange):
+    """ccxt 实例只保留会用到的交易对，markets_by_id / symbols / currencies 随之重建"""
+    kept = [m for m in (exchange.markets or {}).values() if is_kept(m)]
+    if kept:
+        exchange.set_markets(kept)
+    return len(kept)
+
+
+def format_price(price, tick, decimals):
+    """与 ccxt price_to_precision 一致：按 tick 四舍五入，去掉末尾多余的 0"""
+    text = f"{math.floor(price / tick + 0.5) * tick:.{decimals}f}"
+    if decimals:
+        text = text.rstrip("0").rstrip(".")
+    return text
+
+
+class MarketStore:
+    def __init__(self, path=MARKETS_FILE):
+        self.path = path
+        self.table = None
+
+    def load(self):
+        """只读 mmap 共享文件，文件不存在或过期时返回 False"""
+        try:
+            if time.time() - os.path.getmtime(self.path) > MAX_AGE:
+                return False
+            self.table = np.load(self.path, mmap_mode="r")
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def publish(self, exchanges):
+        """提取元数据并原子地写入共享文件，然后改为 mmap 读取"""
+        table = extract(exchanges)
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            np.save(f, table)
+        os.replace(tmp, self.path)
+        self.table = np.load(self.path, mmap_mode="r")
+
+    def refresh(self, exchanges):
+        """worker 启动时调用：共享文件新鲜则直接复用，否则由本 worker 重写；之后裁剪 ccxt 的 markets"""
+        if not self.load():
+            self.publish(exchanges)
+            logger.info(f"[元数据] 已写入 {self.path}: {len(self.table)} 个交易对")
+        for exchange in exchanges:
+            prune_markets(exchange)
+
+    def rule(self, exchange_id, symbol):
+        if self.table is None or not len(self.table):
+            return None
+        key = f"{exchange_id}|{symbol}".encode()
+        i = int(np.searchsorted(self.table["key"], key))
+        if i < len(self.table) and self.table["key"][i] == key:
+            row = self.table[i]
+            if row["decimals"] >= 0:
+                return float(row["tick"]), int(row["decimals"])
+        return None
+
+    def formatter(self, exchange, symbol):
+        """返回 price -> str；查不到规则时退回 ccxt（同样用于图表 y 轴的 FuncFormatter）"""
+        rule = self.rule(exchange.id, symbol)
+        if rule is None:
+            return lambda price: exchange.price_to_precision(symbol, price)
+        tick, decimals = rule
+        return lambda price: format_price(price, tick, decimals)
+
+    def price_to_precision(self, exchange, symbol, price):
+        return self.formatter(exchange, symbol)(price)
+
+    def bases(self, exchange_id=None, market_type=SPOT):
+        """已上架的币种（如 BTC），可按交易所过滤"""
+        if self.table is None:
+            return []
+        rows = self.table[self.table["type"] == market_type]
+        if exchange_id is not None:
+            rows = rows[np.char.startswith(rows["key"], f"{exchange_id}|".encode())]
+        return sorted({b.decode() for b in rows["base"]})
+
+    def stats(self):
+        return {
+            "path": self.path,
+            "markets": 0 if self.table is None else len(self.table),
+            "bytes": 0 if self.table is None else self.table.nbytes,
+        }
+
+
+store = MarketStore()
+
+
+def _synthetic_markets(exchange, n):
+    rng = np.random.default_rng(0)
+    markets = []
+    for i in range(n):
+        base = f"C{i}"
+        tick = float(10.0 ** -int(rng.integers(0, 8)))
+        for kind, symbol in (("spot", f"{base}/USDT"), ("swap", f"{base}/USDT:USDT")):
+            markets.append(
+                {
+                    "id": f"{base}USDT{kind}",
+                    "symbol": symbol,
+                    "base": base,
+                    "quote": "USDT",
+                    "settle": "USDT" if kind == "swap" else None,
+                    "type": kind,
+                    "spot": kind == "spot",
+                    "swap": kind == "swap",
+                    "linear": kind == "swap",
+                    "active": True,
+                    "precision": {"price": tick, "amount": 0.001},
+                    "limits": {"amount": {}, "price": {}, "cost": {}},
+                    "info": {"symbol": f"{base}USDT", "filters": [{}] * 6},
+                }
+            )
+        # 其他计价币的交易对，裁剪时会去掉
+        for quote in ("BTC", "ETH", "FDUSD"):
+            markets.append(
+                {
+                    "id": f"{base}{quote}",
+                    "symbol": f"{base}/{quote}",
+                    "base": base,
+                    "quote": quote,
+                    "type": "spot",
+                    "spot": True,
+                    "active": True,
+                    "precision": {"price": 1e-8, "amount": 0.001},
+                    "limits": {"amount": {}, "price": {}, "cost": {}},
+                    "info": {"symbol": f"{base}{quote}", "filters": [{}] * 6},
+                }
+            )
+    exchange.set_markets(markets)
+
+
+def _bench(exchanges):
+    import tracemalloc
+
+    def markets_size(exchange):
+        tracemalloc.start()
+        before = tracemalloc.take_snapshot()
+        clone = type(exchange)()
+        clone.set_markets(list(exchange.markets.values()))
+        size = sum(s.size_diff for s in tracemalloc.take_snapshot().compare_to(before, "filename"))
+        tracemalloc.stop()
+        return size
+
+    sizes_before = {ex.id: markets_size(ex) for ex in exchanges}
+    bench_store = MarketStore(os.path.join(tempfile.gettempdir(), "markets_bench.npy"))
+    bench_store.publish(exchanges)
+    # 只测格式化本身，不含裁剪后的 set_markets 开销
+    samples = np.random.default_rng(1).uniform(0.5, 2.0, 20000)
+    exchange = exchanges[0]
+    symbol = next(s for s in exchange.markets if s.endswith("/USDT"))
+    fast = bench_store.formatter(exchange, symbol)
+    base_price = float(exchange.markets[symbol]["precision"]["price"] or 1) * 12345
+    prices = samples * base_price
+
+    t0 = time.perf_counter()
+    slow_out = [exchange.price_to_precision(symbol, p) for p in prices]
+    t1 = time.perf_counter()
+    fast_out = [fast(p) for p in prices]
+    t2 = time.perf_counter()
+    mismatched = sum(a != b for a, b in zip(slow_out, fast_out))
+
+    for ex in exchanges:
+        prune_markets(ex)
+    sizes_after = {ex.id: markets_size(ex) for ex in exchanges}
+
+    total_before = sum(sizes_before.values()) / 1024 / 1024
+    total_after = sum(sizes_after.values()) / 1024 / 1024
+    print(f"ccxt markets 内存（每个 worker）: {total_before:.1f}MB -> {total_after:.1f}MB（裁剪后）")
+    for ex in exchanges:
+        print(f"  {ex.id:8s} {sizes_before[ex.id] / 1024:9.0f}KB -> {sizes_after[ex.id] / 1024:8.0f}KB")
+    print(
+        f"共享元数据文件: {len(bench_store.table)} 个交易对, {bench_store.table.nbytes / 1024:.0f}KB（各 worker 共享同一份页缓存）"
+    )
+    print(
+        f"价格格式化 ({symbol}): ccxt {len(prices) / (t1 - t0):,.0f}/s -> 快速 {len(prices) / (t2 - t1):,.0f}/s，"
+        f"结果不一致 {mismatched}/{len(prices)}"
+    )
+
+
+if __name__ == "__main__":
+    if "--synthetic" in sys.argv:
+        bench_exchanges = [ccxt.binance(), ccxt.bybit()]
+        for ex in bench_exchanges:
+            _synthetic_markets(ex, 2000)
+    else:
+        bench_exchanges = [getattr(ccxt, i)() for i in ("binance", "bybit", "okx", "bitget", "gate", "htx")]
+        for ex in bench_exchanges:
+            ex.load_markets()
+    _bench(bench_exchanges)
@@ -0,0 +1,128 @@
+import math
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+
+# === 🔧 热门币种预取配置 ===
+TOP_N = 5  # 预取的热门 (symbol, timeframe) 数量
+HALF_LIFE = 600  # 请求计数的半衰期（秒），越小越跟随最近的热点
+MIN_SCORE = 2.0  # 衰减后的计数低于该值不预取，避免偶发请求占用预算
+REFRESH_LEAD = 3  # 缓存到期前多少秒开始刷新
+CONCURRENCY = 4  # 同时进行的刷新数
+CPU_BUDGET = 0.25  # 预取线程占用 CPU 的上限比例（单核）
+CHECK_INTERVAL = 1.0  # 检查间隔（秒）
+
+
+class DecayingCounter:
+    """指数衰减计数：score = score * 0.5 ** (Δt / HALF_LIFE) + 1"""
+
+    def __init__(self, half_life=HALF_LIFE):
+        self.decay = math.log(2) / half_life
+        self.scores = {}  # key -> (score, 上次更新时间)
+        self.lock = threading.Lock()
+
+    def _current(self, key, now):
+        score, ts = self.scores.get(key, (0.0, now))
+        return score * math.exp(-self.decay * (now - ts))
+
+    def hit(self, key):
+        now = time.time()
+        with self.lock:
+            self.scores[key] = (self._current(key, now) + 1, now)
+
+    def top(self, n, min_score=MIN_SCORE):
+        now = time.time()
+        with self.lock:
+            ranked = [(self._current(key, now), key) for key in self.scores]
+            # 顺便清理已经冷却的 key
+            for score, key in ranked:
+                if score < 0.01:
+                    del self.scores[key]
+        ranked.sort(reverse=True)
+        return [(key, score) for score, key in ranked[:n] if score >= min_score]
+
+
+class Prefetcher:
+    """
+    后台预取：按衰减计数选出最热门的 TOP_N 个 key，
+    在其缓存到期前 REFRESH_LEAD 秒重新计算响应，热门请求因此直接命中内存。
+    每个热门 key 每 (ttl - REFRESH_LEAD) 秒刷新一次，每分钟的刷新预算按 TOP_N 个 key 都保持预热算出
+    （每次刷新约 3~10 个上游请求），到期的 key 最多 CONCURRENCY 个并发刷新。
+    refresh(key) 在独立线程池中同步执行，返回它交给其他线程的工作消耗的 CPU 秒数（没有则返回 None），
+    与本线程的 CPU 时间一起计入 CPU_BUDGET；expires_at(key) 返回该 key 缓存的到期时间（无缓存返回 0）。
+    """
+
+    def __init__(self, refresh, expires_at, ttl):
+        self.refresh = refresh
+        self.expires_at = expires_at
+        self.max_per_min = math.ceil(TOP_N * 60 / max(1.0, ttl - REFRESH_LEAD))
+        self.counter = DecayingCounter()
+        self.refresh_times = []
+        self.inflight = set()
+        self.pool = ThreadPoolExecutor(max_workers=CONCURRENCY, thread_name_prefix="prefetch")
+        self.cpu_lock = threading.Lock()
+        self.cpu_used = 0.0
+        self.started = time.time()
+        self.refreshed = 0
+        self.skipped_budget = 0
+
+    def record(self, key):
+        self.counter.hit(key)
+
+    def _upstream_budget_left(self):
+        now = time.time()
+        self.refresh_times = [t for t in self.refresh_times if now - t < 60]
+        return len(self.refresh_times) < self.max_per_min
+
+    def _cpu_budget_left(self):
+        wall = max(1.0, time.time() - self.started)
+        return self.cpu_used / wall < CPU_BUDGET
+
+    def _run_refresh(self, key):
+        t0 = time.thread_time()
+        offloaded = 0.0
+        try:
+            offloaded = self.refresh(key) or 0.0
+        finally:
+            with self.cpu_lock:
+                self.cpu_used += time.thread_time() - t0 + offloaded
+
+    async def _refresh_one(self, key, score):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(self.pool, self._run_refresh, key)
+            self.refreshed += 1
+            logger.debug(f"[预取] 已刷新 {key} (score={score:.1f})")
+        except Exception as e:
+            logger.warning(f"[预取] 刷新 {key} 失败: {e}")
+        finally:
+            self.inflight.discard(key)
+
+    async def run(self):
+        logger.info(f"[预取] 已启动，TOP_N={TOP_N}，每分钟最多刷新 {self.max_per_min} 次")
+        while True:
+            await asyncio.sleep(CHECK_INTERVAL)
+            now = time.time()
+            for key, score in self.counter.top(TOP_N):
+                if key in self.inflight or self.expires_at(key) - now > REFRESH_LEAD:
+                    continue
+                if len(self.inflight) >= CONCURRENCY:
+                    break
+                if not self._upstream_budget_left() or not self._cpu_budget_left():
+                    self.skipped_budget += 1
+                    break
+                self.refresh_times.append(now)
+                self.inflight.add(key)
+                asyncio.ensure_future(self._refresh_one(key, score))
+
+    def stats(self):
+        return {
+            "top": [(f"{k[0]}:{k[1]}", round(s, 1)) for k, s in self.counter.top(TOP_N, 0)],
+            "refreshed": self.refreshed,
+            "inflight": len(self.inflight),
+            "max_per_min": self.max_per_min,
+            "skipped_budget": self.skipped_budget,
+            "cpu_ratio": round(self.cpu_used / max(1.0, time.time() - self.started), 4),
+        }
@@ -0,0 +1,243 @@
+import time
+import threading
+from contextlib import contextmanager
+import ccxt
+from loguru import logger
+
+# === 🔧 限频调度配置 ===
+INTERACTIVE = 0  # 用户请求
+BACKGROUND = 1  # 预取、推送等后台刷新
+SAFETY = 0.8  # 只用交易所限额的 80%
+INTERACTIVE_MAX_WAIT = 2.0  # 用户请求最多排队多久（秒），超过则换下一个交易所
+BACKGROUND_MAX_WAIT = 30.0
+BACKOFF_BASE = 5  # 收到 429 后的首次退避（秒）
+BACKOFF_MAX = 300
+BAN_BACKOFF = 600  # 收到 418（IP 被封）后的退避（秒）
+
+# 各交易所公开 REST 限额，换算成 (桶容量, 每秒补充量)，单位为权重
+EXCHANGE_LIMITS = {
+    "binance": (1200, 20),  # 现货 6000/分钟、合约 2400/分钟，按较小的合约额度
+    "bybit": (120, 20),  # 600 次 / 5 秒 / IP
+    "okx": (20, 10),  # 行情接口约 20 次 / 2 秒
+    "bitget": (20, 20),  # 20 次 / 秒
+    "gate": (200, 40),  # 200 次 / 10 秒
+    "htx": (100, 10),  # 100 次 / 10 秒
+}
+DEFAULT_LIMIT = (20, 5)
+
+# 各接口权重，未列出的按 1 计
+ENDPOINT_WEIGHTS = {
+    "binance": {"fetch_ticker": 2, "fetch_ohlcv": 5, "fetch_funding_rate": 1, "load_markets": 40},
+}
+DEFAULT_WEIGHTS = {"load_markets": 10}
+# 按 limit 分档计权重的接口：[(limit 上限, 权重), ...]，None 为兜底档，优先于 ENDPOINT_WEIGHTS
+# binance 合约K线 [1,100) 1、[100,500) 2、[500,1000] 5、更多 10，现货固定 2，取两者较大值
+LIMIT_WEIGHTS = {
+    "binance": {"fetch_ohlcv": [(499, 2), (1000, 5), (None, 10)]},
+}
+
+_local = threading.local()
+
+
+@contextmanager
+def priority(level):
+    """在当前线程内把之后经过调度器的调用标记为指定优先级"""
+    previous = getattr(_local, "priority", INTERACTIVE)
+    _local.priority = level
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+@contextmanager
+def deadline(at):
+    """在当前线程内设置截止时间（time.monotonic()），之后的排队和 HTTP 超时都不超过剩余时间"""
+    previous = getattr(_local, "deadline", None)
+    _local.deadline = at if previous is None else min(at, previous)
+    try:
+        yield
+    finally:
+        _local.deadline = previous
+
+
+def current_priority():
+    return getattr(_local, "priority", INTERACTIVE)
+
+
+def expired():
+    left = time_left()
+    return left is not None and left <= 0
+
+
+def time_left():
+    """当前线程距截止时间的秒数，没有截止时间返回 None"""
+    at = getattr(_local, "deadline", None)
+    return None if at is None else at - time.monotonic()
+
+
+class DeadlineTimeout:
+    """
+    替换 ccxt 交易所类的 timeout 属性（毫秒，ccxt 每次 HTTP 请求时读取）：
+    当前线程有截止时间时返回剩余时间，否则返回原值。按线程取值，同一实例被多个请求并发使用也互不影响。
+    """
+
+    def __get__(self, obj, owner=None):
+        if obj is None:
+            return self
+        base = obj.__dict__.get("_base_timeout", 10000)
+        left = time_left()
+        return base if left is None else max(1, min(base, left * 1000))
+
+    def __set__(self, obj, value):
+        obj.__dict__["_base_timeout"] = value
+
+
+def bind_deadline(exchange):
+    cls = type(exchange)
+    if not isinstance(cls.__dict__.get("timeout"), DeadlineTimeout):
+        base = exchange.timeout
+        cls.timeout = DeadlineTimeout()
+        exchange.timeout = base
+
+
+def weight(exchange_id, method, limit=None):
+    tiers = LIMIT_WEIGHTS.get(exchange_id, {}).get(method)
+    if tiers and limit is not None:
+        return next(w for upper, w in tiers if upper is None or limit <= upper)
+    weights = ENDPOINT_WEIGHTS.get(exchange_id, DEFAULT_WEIGHTS)
+    return weights.get(method, DEFAULT_WEIGHTS.get(method, 1))
+
+
+def refill_rate(exchange_id):
+    """实际使用的每秒补充量（已乘 SAFETY）"""
+    return EXCHANGE_LIMITS.get(exchange_id, DEFAULT_LIMIT)[1] * SAFETY
+
+
+class ExchangeLimiter:
+    """单个交易所的加权令牌桶，高优先级等待者存在时低优先级不取令牌"""
+
+    def __init__(self, exchange_id):
+        capacity, per_sec = EXCHANGE_LIMITS.get(exchange_id, DEFAULT_LIMIT)
+        self.capacity = capacity * SAFETY
+        self.rate = refill_rate(exchange_id)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.cond = threading.Condition()
+        self.waiting = [0, 0]
+        self.blocked_until = 0.0
+        self.strikes = 0
+        self.stats = {"calls": 0, "waited": 0.0, "rate_limited": 0, "rejected": 0}
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self, weight, level, max_wait):
+        deadline = time.monotonic() + max_wait
+        weight = min(weight, self.capacity)
+        with self.cond:
+            self.waiting[level] += 1
+            try:
+                while True:
+                    now = time.monotonic()
+                    self._refill(now)
+                    higher_waiting = any(self.waiting[:level])
+                    if now >= self.blocked_until and not higher_waiting and self.tokens >= weight:
+                        self.tokens -= weight
+                        self.stats["waited"] += max_wait - (deadline - now)
+                        return True
+                    # 退避结束前已到截止时间则立即放弃，不白等
+                    if now >= deadline or self.blocked_until >= deadline:
+                        self.stats["rejected"] += 1
+                        return False
+                    # 等到足够的令牌补充完、退避结束或截止时间，取最早的
+                    need = max(0.0, weight - self.tokens) / self.rate
+                    wake = max(need, self.blocked_until - now, 0.005)
+                    self.cond.wait(min(wake, deadline - now))
+            finally:
+                self.waiting[level] -= 1
+                self.cond.notify_all()
+
+    def penalize(self, ban=False, retry_after=None):
+        with self.cond:
+            self.strikes += 1
+            self.stats["rate_limited"] += 1
+            if ban:
+                delay = BAN_BACKOFF
+            elif retry_after:
+                delay = retry_after
+            else:
+                delay = min(BACKOFF_MAX, BACKOFF_BASE * 2 ** (self.strikes - 1))
+            self.blocked_until = max(self.blocked_until, time.monotonic() + delay)
+            self.tokens = 0
+            return delay
+
+    def succeed(self):
+        if self.strikes:
+            with self.cond:
+                self.strikes = 0
+
+
+class RateLimitScheduler:
+    """
+    所有 ccxt 请求的统一入口：按交易所的加权令牌桶排队，用户请求优先于后台刷新，
+    收到 429/418 后该交易所整体退避，退避期间用户请求直接失败以便换下一个交易所。
+    """
+
+    def __init__(self):
+        self.limiters = {}
+        self.lock = threading.Lock()
+
+    def limiter(self, exchange):
+        with self.lock:
+            if exchange.id not in self.limiters:
+                self.limiters[exchange.id] = ExchangeLimiter(exchange.id)
+                bind_deadline(exchange)
+            return self.limiters[exchange.id]
+
+    def call(self, exchange, method, *args, level=None, max_wait=None, **kwargs):
+        level = current_priority() if level is None else level
+        if max_wait is None:
+            max_wait = INTERACTIVE_MAX_WAIT if level == INTERACTIVE else BACKGROUND_MAX_WAIT
+        left = time_left()
+        if left is not None:
+            if left <= 0:
+                raise ccxt.RequestTimeout(f"{exchange.id} {method} 已超过请求截止时间")
+            max_wait = min(max_wait, left)
+        # 未加载交易对时 ccxt 会隐式调用 load_markets，先显式经过调度器
+        if method != "load_markets" and not exchange.markets:
+            self.call(exchange, "load_markets", level=level, max_wait=max_wait)
+
+        limiter = self.limiter(exchange)
+        cost = weight(exchange.id, method, kwargs.get("limit"))
+        if not limiter.acquire(cost, level, max_wait):
+            raise ccxt.RateLimitExceeded(f"{exchange.id} {method} 排队超时（本地限频）")
+        limiter.stats["calls"] += 1
+        try:
+            result = getattr(exchange, method)(*args, **kwargs)
+        except (ccxt.DDoSProtection, ccxt.RateLimitExceeded) as e:
+            ban = "418" in str(e)
+            headers = getattr(exchange, "last_response_headers", None) or {}
+            retry_after = headers.get("Retry-After") or headers.get("retry-after")
+            delay = limiter.penalize(
+                ban=ban, retry_after=float(retry_after) if retry_after else None
+            )
+            logger.warning(f"[限频] {exchange.id} {method} 被限流{'(418)' if ban else ''}，退避 {delay:.0f}s")
+            raise
+        limiter.succeed()
+        return result
+
+    def stats(self):
+        now = time.monotonic()
+        return {
+            exchange_id: {
+                **limiter.stats,
+                "tokens": round(limiter.tokens, 1),
+                "blocked_for": round(max(0.0, limiter.blocked_until - now), 1),
+            }
+            for exchange_id, limiter in self.limiters.items()
+        }
+
+
+scheduler = RateLimitScheduler()
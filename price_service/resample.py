@@ -0,0 +1,178 @@
+import time
+import threading
+import numpy as np
+import ccxt
+from loguru import logger
+from ratelimit import scheduler
+
+# === 🔧 K线缓存与重采样配置 ===
+CANDLE_CACHE_TTL = 10  # 已下载K线的缓存时间（秒）
+MAX_BASE_CANDLES = 1000  # 一次下载的细周期K线上限，超过则直接下载目标周期
+CACHE_MAX_ENTRIES = 2000  # 缓存条目上限，超出时淘汰最旧的（批量筛选的币种池也在其中）
+
+WEEK_OFFSET_MS = 4 * 86400 * 1000  # 1970-01-01 是周四，周线从周一 00:00 UTC 开始
+COLUMNS = 6  # timestamp, open, high, low, close, volume
+
+# (exchange.id, symbol, timeframe) -> (下载时间, ndarray[n, 6])
+_cache = {}
+_lock = threading.Lock()
+stats = {"fetched": 0, "resampled": 0, "hits": 0}
+
+
+def timeframe_ms(timeframe):
+    """周期长度（毫秒），1M 不是固定长度，返回 None"""
+    if timeframe.endswith("M"):
+        return None
+    return ccxt.Exchange.parse_timeframe(timeframe) * 1000
+
+
+def align(timestamps, timeframe):
+    """把时间戳对齐到交易所的K线开始时间：日内及日线按 UTC 纪元对齐，周线按周一，月线按自然月"""
+    if timeframe.endswith("M"):
+        months = timestamps.astype("datetime64[ms]").astype("datetime64[M]")
+        return months.astype("datetime64[ms]").astype(np.int64)
+    tf_ms = timeframe_ms(timeframe)
+    if timeframe.endswith("w"):
+        return (timestamps - WEEK_OFFSET_MS) // tf_ms * tf_ms + WEEK_OFFSET_MS
+    return timestamps // tf_ms * tf_ms
+
+
+def can_derive(target, base):
+    """target 能否由 base 精确聚合得到"""
+    base_ms = timeframe_ms(base)
+    if base_ms is None or target == base:
+        return False
+    if target.endswith("M"):
+        # 自然月边界总是落在日线边界上
+        return 86400 * 1000 % base_ms == 0
+    target_ms = timeframe_ms(target)
+    return target_ms > base_ms and target_ms % base_ms == 0
+
+
+def ratio(target, base):
+    """一根 target 大约包含多少根 base"""
+    target_ms = timeframe_ms(target) or 31 * 86400 * 1000
+    return -(-target_ms // timeframe_ms(base))
+
+
+def resample(candles, timeframe):
+    """
+    向量化 OHLCV 聚合：按对齐后的开始时间分组，open 取首、close 取尾、
+    high/low 取极值、volume 求和。开头不完整的一根会被丢弃，最后一根是进行中的K线，与交易所一致。
+    """
+    if len(candles) == 0:
+        return candles
+    ts = candles[:, 0].astype(np.int64)
+    buckets = align(ts, timeframe)
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(candles)] - 1
+    out = np.empty((len(starts), COLUMNS), dtype=np.float64)
+    out[:, 0] = buckets[starts]
+    out[:, 1] = candles[starts, 1]
+    out[:, 2] = np.maximum.reduceat(candles[:, 2], starts)
+    out[:, 3] = np.minimum.reduceat(candles[:, 3], starts)
+    out[:, 4] = candles[ends, 4]
+    out[:, 5] = np.add.reduceat(candles[:, 5], starts)
+    if ts[0] != buckets[0]:
+        out = out[1:]
+    return out
+
+
+def _store(key, candles):
+    with _lock:
+        _cache[key] = (time.time(), candles)
+        if len(_cache) > CACHE_MAX_ENTRIES:
+            oldest = min(_cache, key=lambda k: _cache[k][0])
+            del _cache[oldest]
+
+
+def _cached(exchange, symbol, timeframe):
+    entry = _cache.get((exchange.id, symbol, timeframe))
+    if entry and time.time() - entry[0] < CANDLE_CACHE_TTL:
+        return entry[1]
+    return None
+
+
+def _fetch(exchange, symbol, timeframe, limit):
+    ohlcv = scheduler.call(exchange, "fetch_ohlcv", symbol, timeframe, limit=limit)
+    candles = np.asarray(ohlcv, dtype=np.float64).reshape(-1, COLUMNS)
+    _store((exchange.id, symbol, timeframe), candles)
+    stats["fetched"] += 1
+    return candles
+
+
+def _from_cache(exchange, symbol, timeframe, limit):
+    """先找目标周期本身，再找能聚合出目标周期的更细周期"""
+    candles = _cached(exchange, symbol, timeframe)
+    if candles is not None and len(candles) >= limit:
+        stats["hits"] += 1
+        return candles[-limit:]
+    with _lock:
+        keys = [k for k in _cache if k[0] == exchange.id and k[1] == symbol]
+    for _, _, base in keys:
+        if not can_derive(timeframe, base):
+            continue
+        base_candles = _cached(exchange, symbol, base)
+        if base_candles is None:
+            continue
+        derived = resample(base_candles, timeframe)
+        if len(derived) >= limit:
+            stats["resampled"] += 1
+            return derived[-limit:]
+    return None
+
+
+def _pick_base(timeframes, limit):
+    """
+    从 timeframes 中选一个基础周期，使下载不超过 MAX_BASE_CANDLES 根就能聚合出的周期尽量多，
+    个数相同时取下载量少的。返回 (基础周期, 能聚合出的周期, 下载根数)。
+    """
+    best_base, best_cover, best_need, best_rank = None, [], 0, None
+    for base in timeframes:
+        cover = [
+            tf
+            for tf in timeframes
+            if tf == base
+            or (can_derive(tf, base) and ratio(tf, base) * (limit + 1) <= MAX_BASE_CANDLES)
+        ]
+        need = max(ratio(tf, base) * (limit + 1) if tf != base else limit for tf in cover)
+        rank = (len(cover), -need)
+        if best_rank is None or rank > best_rank:
+            best_base, best_cover, best_need, best_rank = base, cover, need, rank
+    return best_base, best_cover, best_need
+
+
+def get_ohlcv(exchange, symbol, timeframe, limit):
+    """获取 limit 根K线（ndarray[n, 6]），优先用缓存或由更细周期聚合，否则直接下载"""
+    candles = _from_cache(exchange, symbol, timeframe, limit)
+    if candles is not None:
+        return candles
+    return _fetch(exchange, symbol, timeframe, limit)[-limit:]
+
+
+def get_ohlcv_multi(exchange, symbol, timeframes, limit):
+    """
+    多周期一次下载：选一个能聚合出尽量多目标周期、且下载量不超过 MAX_BASE_CANDLES 的基础周期，
+    下载一次后本地聚合；剩下聚合不出来的周期再单独下载。返回 {timeframe: ndarray}。
+    """
+    result = {}
+    for tf in timeframes:
+        candles = _from_cache(exchange, symbol, tf, limit)
+        if candles is not None:
+            result[tf] = candles
+    missing = [tf for tf in timeframes if tf not in result]
+
+    best_base, best_cover, best_need = _pick_base(missing, limit)
+
+    if best_base is not None and len(best_cover) > 1:
+        base_candles = _fetch(exchange, symbol, best_base, best_need)
+        for tf in best_cover:
+            derived = base_candles if tf == best_base else resample(base_candles, tf)
+            if len(derived) >= limit:
+                result[tf] = derived[-limit:]
+        logger.debug(f"[K线] {symbol} 由 {best_base} 一次下载派生 {best_cover}")
+
+    for tf in timeframes:
+        if tf not in result:
+            result[tf] = get_ohlcv(exchange, symbol, tf, limit)
+    return result
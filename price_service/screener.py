@@ -0,0 +1,141 @@
+import time
+import asyncio
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from loguru import logger
+import ratelimit
+from ratelimit import priority, BACKGROUND
+from markets import store as market_store, SPOT
+import indicators
+import resample
+
+# === 🔧 批量筛选配置 ===
+SCREEN_EXCHANGE = "binance"  # 用哪个交易所的 USDT 现货作为币种池
+SCREEN_INTERVAL = 60  # 每轮刷新间隔（秒）
+MAX_SYMBOLS = 300  # 币种池上限
+BUDGET_SHARE = 0.5  # 所有筛选任务合计最多占用该交易所令牌补充速率的比例，其余留给用户请求和推送
+FETCH_WORKERS = 8  # 下载K线的并发线程数，实际速率由 ratelimit 控制
+RANGE_WINDOW = 96  # 高低区间与涨跌幅的窗口（与K线图展示的根数一致）
+VOLUME_WINDOW = 20  # 成交量 z-score 的基准窗口
+CROSS_LOOKBACK = 3  # 最近几根内的均线交叉
+
+
+class Screener:
+    """
+    后台按周期刷新币种池的K线（后台优先级，走限频调度），
+    每轮把所有币种对齐成一个二维数组一次算完指标，query() 直接读最近一轮结果。
+
+    每轮只下载 SCREEN_INTERVAL 秒内按 budget_share 可用的权重，优先最久没更新的币种，
+    币种池较大时分几轮轮完；刚换K线时还没轮到的币种最新一根为 NaN，轮到前不出现在筛选结果里。
+    """
+
+    def __init__(self, exchanges, timeframe, ma_periods, length, budget_share=BUDGET_SHARE):
+        self.exchanges = exchanges
+        self.timeframe = timeframe
+        self.ma_periods = ma_periods
+        self.length = length
+        self.budget_share = budget_share
+        self.candles = {}  # symbol -> ndarray[n, 6]，下载失败时沿用上一轮
+        self.fetched_at = {}  # symbol -> 上次下载成功的时间
+        self.result = None
+        self.symbols = []
+        self.updated = 0.0
+        self.compute_ms = 0.0
+        self.last_batch = 0
+        self.pool = ThreadPoolExecutor(max_workers=FETCH_WORKERS, thread_name_prefix="screener")
+        # refresh 本身也用单独的线程，不占默认线程池
+        self.runner = ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"screen-{timeframe}")
+
+    def exchange(self):
+        return next((ex for ex in self.exchanges if ex.id == SCREEN_EXCHANGE), None)
+
+    def universe(self):
+        return [f"{base}/USDT" for base in market_store.bases(SCREEN_EXCHANGE, SPOT)][:MAX_SYMBOLS]
+
+    def batch_size(self):
+        """按令牌补充速率算出每轮能下载的币种数"""
+        cost = ratelimit.weight(SCREEN_EXCHANGE, "fetch_ohlcv", self.length)
+        budget = ratelimit.refill_rate(SCREEN_EXCHANGE) * SCREEN_INTERVAL * self.budget_share
+        return max(1, int(budget // cost))
+
+    def _fetch(self, exchange, symbol):
+        with priority(BACKGROUND):
+            try:
+                self.candles[symbol] = resample.get_ohlcv(exchange, symbol, self.timeframe, self.length)
+                self.fetched_at[symbol] = time.time()
+            except Exception as e:
+                logger.debug(f"[筛选] {symbol} {self.timeframe} 下载失败: {e}")
+
+    def refresh(self):
+        exchange = self.exchange()
+        symbols = self.universe()
+        if exchange is None or not symbols:
+            return
+        batch = sorted(symbols, key=lambda s: self.fetched_at.get(s, 0.0))[: self.batch_size()]
+        list(self.pool.map(lambda s: self._fetch(exchange, s), batch))
+        self.last_batch = len(batch)
+        self.candles = {s: self.candles[s] for s in symbols if s in self.candles}
+        self.fetched_at = {s: self.fetched_at[s] for s in symbols if s in self.fetched_at}
+
+        t0 = time.perf_counter()
+        block = indicators.CandleBlock.align(self.candles, self.timeframe, self.length)
+        self.result = indicators.compute(
+            block, self.ma_periods, RANGE_WINDOW, VOLUME_WINDOW, CROSS_LOOKBACK
+        )
+        self.symbols = block.symbols
+        self.compute_ms = (time.perf_counter() - t0) * 1e3
+        self.updated = time.time()
+        logger.info(
+            f"[筛选] {self.timeframe} 本轮下载 {len(batch)} 个，"
+            f"已有 {len(self.symbols)}/{len(symbols)} 个币种，"
+            f"对齐+计算 {self.compute_ms:.1f}ms"
+        )
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            try:
+                await loop.run_in_executor(self.runner, self.refresh)
+            except Exception as e:
+                logger.warning(f"[筛选] {self.timeframe} 刷新失败: {e}")
+            await asyncio.sleep(SCREEN_INTERVAL)
+
+    def query(self, cross=None, min_volume_z=None, sort="volume_z", limit=50):
+        """
+        按条件筛选最近一轮结果：cross 为 golden / death（任一相邻均线对在 CROSS_LOOKBACK 根内交叉），
+        min_volume_z 为成交量 z-score 下限，按 sort 列降序返回前 limit 个。
+        """
+        if self.result is None:
+            return []
+        result = self.result
+        mask = ~np.isnan(result["close"])
+        if cross is not None:
+            want = 1 if cross == "golden" else -1
+            pairs = zip(self.ma_periods, self.ma_periods[1:])
+            mask &= np.any([result[f"cross_{f}_{s}"] == want for f, s in pairs], axis=0)
+        if min_volume_z is not None:
+            mask &= result["volume_z"] >= min_volume_z
+        order = np.flatnonzero(mask)
+        keys = np.nan_to_num(result[sort][order], nan=-np.inf)
+        order = order[np.argsort(-keys, kind="stable")][:limit]
+        return [
+            {"symbol": self.symbols[i], **{k: _json_value(v[i]) for k, v in result.items()}}
+            for i in order
+        ]
+
+    def stats(self):
+        return {
+            "timeframe": self.timeframe,
+            "symbols": len(self.symbols),
+            "batch": self.last_batch,
+            "batch_size": self.batch_size(),
+            "updated": self.updated,
+            "compute_ms": round(self.compute_ms, 2),
+        }
+
+
+def _json_value(value):
+    if isinstance(value, np.integer):
+        return int(value)
+    value = float(value)
+    return None if np.isnan(value) else round(value, 8)
@@ -0,0 +1,168 @@
+import time
+import asyncio
+from loguru import logger
+from ratelimit import scheduler, BACKGROUND
+
+# === 🔧 推送配置 ===
+REFRESH_INTERVAL = 2.0  # 每个市场的上游刷新间隔（秒）
+IDLE_GRACE = 30  # 最后一个订阅者离开后，刷新任务再保留多久（秒）
+MAX_SYMBOLS_PER_CLIENT = 20
+MAX_FEEDS_PER_CLIENT = 40  # 每个客户端累计最多订阅的 (币种, 市场) 数
+SLOW_CLIENT_TIMEOUT = 60  # 单次发送超过该时间仍未完成则断开慢客户端（秒）
+MAX_EMPTY_WALKS = 3  # 从未取到价格的市场，连续几次遍历所有交易所都没有结果就停止刷新
+
+MARKET_SUFFIX = {"spot": "/USDT", "future": "/USDT:USDT"}
+
+
+class Subscriber:
+    """
+    单个客户端的发送缓冲：每个市场只保留最新一条更新（合并旧值），
+    慢客户端不会让缓冲无限增长，也不会拖慢上游刷新。
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.keys = set()  # 当前订阅的 (symbol, market)
+        self.event = asyncio.Event()
+        self.conflated = 0
+        self.last_read = time.time()
+
+    def push(self, key, update):
+        if key in self.pending:
+            self.conflated += 1
+        self.pending[key] = update
+        self.event.set()
+
+    async def next_batch(self, timeout=None):
+        await asyncio.wait_for(self.event.wait(), timeout)
+        batch, self.pending = list(self.pending.values()), {}
+        self.event.clear()
+        self.last_read = time.time()
+        return batch
+
+
+class MarketFeed:
+    """一个市场（如 BTC 现货）对应唯一一个上游刷新任务，结果共享给所有订阅者"""
+
+    def __init__(self, key):
+        self.key = key
+        self.latest = None
+        self.subscribers = set()
+        self.task = None
+        self.exchange = None  # 第一次命中后固定使用该交易所，避免每次都遍历
+        self.idle_since = None
+        self.empty_walks = 0
+
+
+class PriceHub:
+    def __init__(self, exchanges, format_quote):
+        self.exchanges = exchanges
+        self.format_quote = format_quote
+        self.feeds = {}
+        self.upstream_calls = 0
+
+    def _fetch(self, feed):
+        """在线程中执行：从固定的交易所（或按顺序遍历）获取 ticker"""
+        symbol, market = feed.key
+        market_symbol = f"{symbol}{MARKET_SUFFIX[market]}"
+        candidates = [feed.exchange] if feed.exchange else self.exchanges
+        for exchange in candidates:
+            try:
+                self.upstream_calls += 1
+                ticker = scheduler.call(exchange, "fetch_ticker", market_symbol, level=BACKGROUND)
+                if market_symbol != ticker["symbol"] or ticker["last"] is None:
+                    continue
+                feed.exchange = exchange
+                return {
+                    "symbol": symbol,
+                    "market": market,
+                    "exchange": exchange.id,
+                    "price": ticker["last"],
+                    "change": ticker["percentage"],
+                    "text": self.format_quote(exchange, market_symbol, ticker),
+                    "ts": int(time.time() * 1000),
+                }
+            except Exception:
+                continue
+        # 固定的交易所失效后下次重新遍历
+        feed.exchange = None
+        return None
+
+    async def _refresh(self, feed):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not feed.subscribers:
+                if time.time() - feed.idle_since > IDLE_GRACE:
+                    break
+            else:
+                try:
+                    update = await loop.run_in_executor(None, self._fetch, feed)
+                except Exception as e:
+                    logger.warning(f"[推送] {feed.key} 刷新失败: {e}")
+                    update = None
+                if update is None and feed.latest is None:
+                    feed.empty_walks += 1
+                    if feed.empty_walks >= MAX_EMPTY_WALKS:
+                        self._not_found(feed)
+                        break
+                if update is not None and (
+                    feed.latest is None
+                    or (update["price"], update["change"])
+                    != (feed.latest["price"], feed.latest["change"])
+                ):
+                    feed.latest = update
+                    for sub in list(feed.subscribers):
+                        sub.push(feed.key, update)
+            await asyncio.sleep(REFRESH_INTERVAL)
+        self.feeds.pop(feed.key, None)
+        logger.info(f"[推送] {feed.key} 停止刷新")
+
+    def _not_found(self, feed):
+        """所有交易所都找不到该市场：通知订阅者并让出名额"""
+        symbol, market = feed.key
+        logger.info(f"[推送] {feed.key} 在所有交易所都没有行情")
+        for sub in list(feed.subscribers):
+            sub.keys.discard(feed.key)
+            sub.push(feed.key, {"symbol": symbol, "market": market, "error": "not_found"})
+        feed.subscribers.clear()
+
+    def subscribe(self, sub, symbol, market):
+        """超过 MAX_FEEDS_PER_CLIENT 时抛出 ValueError"""
+        key = (symbol.upper(), market)
+        if key not in sub.keys and len(sub.keys) >= MAX_FEEDS_PER_CLIENT:
+            raise ValueError(f"每個連接最多訂閱 {MAX_FEEDS_PER_CLIENT} 個市場")
+        sub.keys.add(key)
+        feed = self.feeds.get(key)
+        if feed is None:
+            feed = self.feeds[key] = MarketFeed(key)
+            feed.task = asyncio.ensure_future(self._refresh(feed))
+            logger.info(f"[推送] 开始刷新 {key}")
+        feed.subscribers.add(sub)
+        feed.idle_since = None
+        if feed.latest is not None:
+            sub.push(key, feed.latest)
+
+    def unsubscribe(self, sub, symbol=None, market=None):
+        for key, feed in list(self.feeds.items()):
+            if symbol is not None and key != (symbol.upper(), market):
+                continue
+            feed.subscribers.discard(sub)
+            sub.keys.discard(key)
+            if not feed.subscribers and feed.idle_since is None:
+                feed.idle_since = time.time()
+
+    def stats(self):
+        return {
+            "markets": len(self.feeds),
+            "subscriptions": sum(len(f.subscribers) for f in self.feeds.values()),
+            "upstream_calls": self.upstream_calls,
+        }
+
+
+def parse_subscription(symbols, market):
+    """返回 [(symbol, market)]，market 为 spot / future / both"""
+    markets = ["spot", "future"] if market == "both" else [market]
+    if any(m not in MARKET_SUFFIX for m in markets):
+        raise ValueError(f"不支持的 market: {market}")
+    symbols = [s.strip().upper() for s in symbols if s.strip()][:MAX_SYMBOLS_PER_CLIENT]
+    return [(s, m) for s in symbols for m in markets]
@@ -0,0 +1,210 @@
+"""
+单进程运行 alpha_monitor、ys_monitor、bwenews 三个监控：
+共用一个 aiohttp 连接池、一个时间轮调度所有轮询、一个 Telegram 通知通道，
+每个监控在独立的任务中运行，异常只会重启该监控本身。
+
+    python runner.py
+"""
+import os
+import sys
+import time
+import random
+import signal
+import asyncio
+import resource
+import aiohttp
+from loguru import logger
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+# 容器内 common 和各监控目录与 runner.py 同在 /app，本地运行时在上一级的仓库根目录
+ROOT = HERE if os.path.isdir(os.path.join(HERE, "common")) else os.path.dirname(HERE)
+for service_dir in ("alpha_monitor", "ys_monitor", "bwenews"):
+    sys.path.append(os.path.join(ROOT, service_dir))
+sys.path.append(ROOT)
+
+import alpha  # noqa: E402
+import ys  # noqa: E402
+import main as bwenews  # noqa: E402
+import pipeline  # noqa: E402
+from enrich import PriceEnricher  # noqa: E402
+from archive import NewsArchive  # noqa: E402
+from common.log import setup_logging  # noqa: E402
+from scheduler import TimerWheel  # noqa: E402
+
+POOL_SIZE = 50  # 共享连接池上限
+REPORT_INTERVAL = 300  # 资源占用与定时精度的输出间隔（秒）
+RESTART_BACKOFF_MAX = 60  # 监控任务崩溃后的最大重启等待（秒）
+TELEGRAM_API = "https://api.telegram.org"
+
+
+class Notifier:
+    """统一的 Telegram 通知通道：各监控只负责入队，一个任务按顺序发送"""
+
+    def __init__(self, session):
+        self.session = session
+        self.queue = asyncio.Queue()
+        self.loop = asyncio.get_running_loop()
+
+    def sender(self, token, chat_id, **extra):
+        """返回可在任意线程调用的 send(message)，供各监控替换自己的发送函数"""
+
+        def send(message):
+            payload = {"chat_id": chat_id, "text": message, **extra}
+            self.loop.call_soon_threadsafe(self.queue.put_nowait, (token, payload))
+
+        return send
+
+    async def run(self):
+        while True:
+            token, payload = await self.queue.get()
+            try:
+                async with self.session.post(
+                    f"{TELEGRAM_API}/bot{token}/sendMessage", data=payload
+                ) as response:
+                    if response.status == 429:
+                        body = await response.json()
+                        retry = body.get("parameters", {}).get("retry_after", 1)
+                        logger.warning(f"❗ Telegram 限流，{retry}s 后重发")
+                        await asyncio.sleep(retry)
+                        self.queue.put_nowait((token, payload))
+                    elif response.status != 200:
+                        logger.error(f"❗ Telegram 发送失败: {await response.text()}")
+            except Exception as e:
+                logger.error(f"❗ Telegram 请求异常: {e}")
+
+
+async def supervise(name, factory):
+    """监控任务隔离：退出或异常后按指数退避重启，运行超过 1 分钟视为恢复正常"""
+    failures = 0
+    while True:
+        started = time.monotonic()
+        try:
+            await factory()
+            logger.warning(f"[{name}] 任务退出，准备重启")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.exception(f"[{name}] 任务异常: {e}")
+        if time.monotonic() - started > 60:
+            failures = 0
+        failures += 1
+        delay = min(RESTART_BACKOFF_MAX, 2**failures)
+        logger.info(f"[{name}] {delay}s 后第 {failures} 次重启")
+        await asyncio.sleep(delay)
+
+
+def alpha_job(session, send):
+    async def job():
+        headers = {"referer": "https://alpha123.uk/zh/index.html"}
+        async with session.get(
+            alpha.API_URL, headers=headers, timeout=aiohttp.ClientTimeout(total=10)
+        ) as response:
+            response.raise_for_status()
+            data = await response.json(content_type=None)
+        alpha.check_update(data, send)
+        return random.randint(300, 600)
+
+    return job
+
+
+def ys_job(session, send):
+    state = {}
+
+    async def job():
+        return await ys.poll_once(session, state, send)
+
+    return job
+
+
+def current_rss_mb():
+    """当前常驻内存（MB），读不到 /proc 时退化为峰值"""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+async def report(wheel):
+    while True:
+        await asyncio.sleep(REPORT_INTERVAL)
+        logger.info(
+            f"[运行器] 常驻内存 {current_rss_mb():.1f}MB | 任务数 {len(asyncio.all_tasks())} | "
+            f"{wheel.summary()}"
+        )
+
+
+async def run():
+    # docker stop 发送 SIGTERM：取消主任务，走 finally 保存状态
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    connector = aiohttp.TCPConnector(limit=POOL_SIZE, ttl_dns_cache=300)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        notifier = Notifier(session)
+        wheel = TimerWheel()
+
+        # alpha_monitor：沿用原来的状态文件和 5~10 分钟随机间隔
+        alpha.current_last_today, alpha.current_last_forecast = alpha.load_state()
+        alpha_send = notifier.sender(
+            alpha.TELEGRAM_TOKEN,
+            alpha.TELEGRAM_CHAT_ID_NEW,
+            parse_mode="HTML",
+            message_thread_id=alpha.TELEGRAM_MESSAGE_TREAD_ID_NEW,
+        )
+        wheel.every("alpha_monitor", alpha_job(session, alpha_send))
+
+        # ys_monitor：轮询交给时间轮，推送源（如已配置）作为独立任务
+        ys_send = notifier.sender(ys.TELEGRAM_TOKEN, ys.TELEGRAM_CHAT_ID, parse_mode="HTML")
+        wheel.every("ys_monitor", ys_job(session, ys_send))
+
+        # bwenews：命中的新闻通过共享通道发送
+        news_send = notifier.sender(
+            pipeline.TELEGRAM_TOKEN, pipeline.TELEGRAM_CHAT_ID, disable_web_page_preview=True
+        )
+
+        async def notify_sink(event):
+            news_send(pipeline.format_telegram(event))
+
+        pipeline.SINK_REGISTRY["notify"] = notify_sink
+        enricher = PriceEnricher(session=session) if bwenews.ENRICH_PRICES else None
+        news_pipeline = pipeline.NewsPipeline(sinks=["log", "notify"], enricher=enricher)
+        archive = NewsArchive() if bwenews.ARCHIVE_MESSAGES else None
+
+        tasks = {
+            "notifier": notifier.run,
+            "timer_wheel": wheel.run,
+            "bwenews_listen": lambda: bwenews.listen(news_pipeline, archive),
+            "bwenews_pipeline": news_pipeline.run,
+            "bwenews_stats": news_pipeline.report,
+            "ys_latency": ys.latency_report_loop,
+            "report": lambda: report(wheel),
+        }
+        if ys.STREAM_URL:
+            tasks["ys_stream"] = lambda: ys.stream_loop(session, ys_send)
+        if archive is not None:
+            tasks["bwenews_archive"] = archive.run
+        if enricher is not None:
+            tasks["bwenews_warm_up"] = enricher.warm_up
+
+        logger.info(f"[运行器] 启动 {len(tasks)} 个任务: {', '.join(tasks)}")
+        try:
+            # warm_up 自己重试到全部加载完成后正常返回，不需要 supervise 重启
+            await asyncio.gather(
+                *(
+                    factory() if name == "bwenews_warm_up" else supervise(name, factory)
+                    for name, factory in tasks.items()
+                )
+            )
+        finally:
+            if enricher is not None:
+                await enricher.close()
+            alpha.save_state(alpha.current_last_today, alpha.current_last_forecast)
+
+
+if __name__ == "__main__":
+    # 各监控只在独立运行时配置日志，合并运行时统一输出到一个文件
+    setup_logging("monitors")
+    try:
+        asyncio.run(run())
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
@@ -0,0 +1,88 @@
+import math
+import time
+import asyncio
+from collections import deque
+from loguru import logger
+from common.stats import percentile
+
+TICK = 0.05  # 时间轮刻度（秒）
+SLOTS = 512  # 时间轮槽数，一圈约 25.6 秒，更长的延迟靠圈数计数
+
+
+class TimerWheel:
+    """
+    哈希时间轮：所有周期任务共用一个 asyncio 定时循环。
+    循环按绝对时间对齐刻度，不会像 time.sleep 循环那样逐次累积漂移；
+    每个定时器实际触发时间与预定时间的偏差记录在 lateness 中。
+    """
+
+    def __init__(self, tick=TICK, slots=SLOTS):
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.cursor = 0
+        self.lateness = deque(maxlen=2000)
+        self.jobs = {}
+
+    def call_later(self, delay, callback, *args):
+        ticks = max(1, math.ceil(delay / self.tick))
+        slot = (self.cursor + ticks) % len(self.slots)
+        rounds = (ticks - 1) // len(self.slots)
+        due = time.monotonic() + delay
+        self.slots[slot].append([rounds, due, callback, args])
+
+    def _advance(self):
+        self.cursor = (self.cursor + 1) % len(self.slots)
+        bucket = self.slots[self.cursor]
+        if not bucket:
+            return
+        pending = []
+        now = time.monotonic()
+        for entry in bucket:
+            if entry[0] > 0:
+                entry[0] -= 1
+                pending.append(entry)
+                continue
+            self.lateness.append(now - entry[1])
+            try:
+                entry[2](*entry[3])
+            except Exception as e:
+                logger.error(f"[调度] 定时回调异常: {e}")
+        self.slots[self.cursor] = pending
+
+    async def run(self):
+        start = time.monotonic()
+        ticks = 0
+        while True:
+            ticks += 1
+            wait = start + ticks * self.tick - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._advance()
+
+    def every(self, name, job, first_delay=0.0, retry_delay=30):
+        """
+        注册周期任务：job 是返回下次间隔（秒）的协程函数。
+        单次执行出错只影响该任务，retry_delay 秒后重试。
+        """
+
+        def launch():
+            self.jobs[name] = asyncio.ensure_future(run_once())
+
+        async def run_once():
+            try:
+                delay = await job()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.exception(f"[调度] {name} 执行失败: {e}")
+                delay = retry_delay
+            self.call_later(delay, launch)
+
+        self.call_later(first_delay, launch)
+
+    def summary(self):
+        return (
+            f"定时偏差 p50={percentile(self.lateness, 0.5) * 1e3:.1f}ms "
+            f"p99={percentile(self.lateness, 0.99) * 1e3:.1f}ms "
+            f"max={max(self.lateness, default=0) * 1e3:.1f}ms"
+        )
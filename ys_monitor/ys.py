@@ -1,21 +1,38 @@
-import sys
+import json
+import random
+import asyncio
+import statistics
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import aiohttp
 import requests
 import time
 from datetime import datetime, timezone, timedelta
 from loguru import logger
-
-# 配置日志
-logger.remove()
-logger.add(
-    sys.stdout,
-    level="INFO",
-    format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan>:<cyan>{line}</cyan> - <level>{message}</level>",
-)
+from common.log import setup_logging
 
 API_URL = "https://api.tzevaadom.co.il/alerts-history/"
 POLL_INTERVAL = 30  # 秒
 processed_alerts = set()
 
+# === ⚡ 低延迟模式配置 ===
+LOW_LATENCY_MODE = True  # False 则回退到原来的 30 秒同步轮询
+FAST_POLL_INTERVAL = 1.0  # 低延迟模式下的轮询间隔（秒）
+POLL_JITTER = 0.25  # 轮询间隔随机抖动比例，避免和上游缓存周期对齐
+MAX_BACKOFF = 30  # 出错时退避的最大间隔（秒）
+REQUEST_TIMEOUT = 5  # 单次请求超时（秒）
+TELEGRAM_TIMEOUT = 10  # Telegram 发送超时（秒）
+STREAM_URL = ""  # 推送源（WebSocket），配置后优先使用，例如 wss://ws.tzevaadom.co.il/socket?platform=WEB
+ALERT_MAX_AGE = 3 * 60  # 只处理 3 分钟内的警报
+LATENCY_TARGET = 2.0  # 检测延迟目标（秒）
+LATENCY_REPORT_INTERVAL = 300  # 延迟统计输出间隔（秒）
+
+last_alert_time = 0  # 已解析过的最新警报时间，同一 id 下后续追加的警报时间更晚，仍会被解析
+detection_latencies = deque(maxlen=500)  # 最近的检测延迟样本（秒）
+stream_connected = False
+_decoder = json.JSONDecoder()
+_send_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="telegram")  # 单线程保证发送顺序
+
 # === 🔧 你的 Telegram Bot 配置 ===
 TELEGRAM_TOKEN = ""  # 替换为你的
 TELEGRAM_CHAT_ID = ""  # 替换为你的 Chat ID
@@ -25,11 +42,11 @@ def send_telegram_message(message):
     url = f"https://api.telegram.org/bot{TELEGRAM_TOKEN}/sendMessage"
     payload = {"chat_id": TELEGRAM_CHAT_ID, "text": message, "parse_mode": "HTML"}
     try:
-        response = requests.post(url, data=payload)
+        response = requests.post(url, data=payload, timeout=TELEGRAM_TIMEOUT)
         if response.status_code != 200:
-            print(f"❗ Telegram 发送失败: {response.text}")
+            logger.error(f"❗ Telegram 发送失败: {response.text}")
     except Exception as e:
-        print(f"❗ Telegram 请求异常: {e}")
+        logger.error(f"❗ Telegram 请求异常: {e}")
 
 
 def get_latest_alert():
@@ -46,7 +63,8 @@ def get_latest_alert():
     return None
 
 
-def process_alert(alert):
+def process_alert(alert, send=None):
+    send = send or send_telegram_message
     alert_items = alert.get("alerts", [])
     now_utc_ts = datetime.now(timezone.utc).timestamp()
 
@@ -82,11 +100,168 @@ def process_alert(alert):
             f"⚠️ 威胁等级: {threat}"
         )
         logger.info("\n" + message + "\n")
-        send_telegram_message(message)
+        send(message)
 
         processed_alerts.add(timestamp)
 
 
+def newest_time(entry):
+    return max((a.get("time", 0) for a in entry.get("alerts", [])), default=0)
+
+
+def iter_new_entries(text):
+    """
+    逐条解码 alerts-history（最新的在前），遇到最新警报早于已处理时间或超出时间窗口的条目立即停止，
+    不再解析剩余的历史列表。按时间而不是 id 判断：一波警报共用一个 id，后续追加的警报时间更晚。
+    与已处理时间相同的条目仍会返回，重复的警报由 process_alert 按时间戳去重。
+    """
+    now_utc_ts = datetime.now(timezone.utc).timestamp()
+    idx = text.find("[")
+    if idx < 0:
+        return
+    idx += 1
+    n = len(text)
+    while True:
+        while idx < n and text[idx] in " \t\r\n,":
+            idx += 1
+        if idx >= n or text[idx] == "]":
+            return
+        entry, idx = _decoder.raw_decode(text, idx)
+        newest = newest_time(entry)
+        if newest < last_alert_time or now_utc_ts - newest > ALERT_MAX_AGE:
+            return
+        yield entry
+
+
+def record_latency(alert):
+    """记录 警报时间 -> 本地检测 的延迟"""
+    now_utc_ts = datetime.now(timezone.utc).timestamp()
+    for item in alert.get("alerts", []):
+        timestamp = item.get("time")
+        if item.get("isDrill", True) or timestamp is None:
+            continue
+        if timestamp in processed_alerts:
+            continue
+        detection_latencies.append(max(0.0, now_utc_ts - timestamp))
+
+
+def send_in_background(message):
+    """交给单线程发送，不等待结果，慢的 Telegram 请求不会阻塞下一次轮询"""
+    _send_pool.submit(send_telegram_message, message)
+
+
+async def handle_alert(alert, send=None):
+    global last_alert_time
+    record_latency(alert)
+    # 解析和去重很快，直接在事件循环中执行；发送交给后台
+    process_alert(alert, send or send_in_background)
+    last_alert_time = max(last_alert_time, newest_time(alert))
+
+
+def next_delay(base, errors):
+    """带抖动的轮询间隔，连续出错时指数退避"""
+    delay = min(MAX_BACKOFF, base * (2**errors)) if errors else base
+    return delay * random.uniform(1 - POLL_JITTER, 1 + POLL_JITTER)
+
+
+async def poll_once(session, state, send=None):
+    """
+    条件请求 alerts-history 一次，返回下一次轮询前应等待的秒数。
+    state 保存 ETag / Last-Modified / 连续出错次数，由调用方在多次调用间保留。
+    """
+    headers = {"User-Agent": "Mozilla/5.0"}
+    if state.get("etag"):
+        headers["If-None-Match"] = state["etag"]
+    if state.get("last_modified"):
+        headers["If-Modified-Since"] = state["last_modified"]
+    errors = state.get("errors", 0)
+    try:
+        async with session.get(
+            API_URL, headers=headers, timeout=aiohttp.ClientTimeout(total=REQUEST_TIMEOUT)
+        ) as response:
+            if response.status == 200:
+                state["etag"] = response.headers.get("ETag")
+                state["last_modified"] = response.headers.get("Last-Modified")
+                text = await response.text()
+                new_entries = list(iter_new_entries(text))
+                # 由旧到新处理，保证 Telegram 推送顺序
+                for entry in reversed(new_entries):
+                    await handle_alert(entry, send)
+                errors = 0
+            elif response.status == 304:
+                errors = 0
+            else:
+                errors += 1
+                logger.error(f"请求失败，状态码: {response.status}，第 {errors} 次")
+    except Exception as e:
+        errors += 1
+        logger.error(f"请求异常: {e}，第 {errors} 次")
+    state["errors"] = errors
+
+    # 推送源在线时轮询只做兜底，放慢频率
+    base = POLL_INTERVAL if stream_connected else FAST_POLL_INTERVAL
+    return next_delay(base, errors)
+
+
+async def poll_loop(session):
+    """短间隔条件请求轮询 alerts-history"""
+    state = {}
+    while True:
+        await asyncio.sleep(await poll_once(session, state))
+
+
+async def stream_loop(session, send=None):
+    """推送源：收到 ALERT 立即处理，断线后指数退避重连"""
+    global stream_connected
+    errors = 0
+    while True:
+        try:
+            async with session.ws_connect(
+                STREAM_URL, headers={"User-Agent": "Mozilla/5.0"}, heartbeat=15
+            ) as ws:
+                logger.info("✅ 推送源已连接")
+                stream_connected = True
+                errors = 0
+                async for msg in ws:
+                    if msg.type != aiohttp.WSMsgType.TEXT:
+                        continue
+                    payload = json.loads(msg.data)
+                    if payload.get("type") != "ALERT":
+                        continue
+                    data = payload.get("data", {})
+                    await handle_alert({"id": data.get("notificationId"), "alerts": [data]}, send)
+        except Exception as e:
+            logger.error(f"推送源异常: {e}")
+        stream_connected = False
+        errors += 1
+        await asyncio.sleep(next_delay(1.0, errors))
+
+
+async def latency_report_loop():
+    """定期输出检测延迟中位数"""
+    while True:
+        await asyncio.sleep(LATENCY_REPORT_INTERVAL)
+        if not detection_latencies:
+            continue
+        samples = sorted(detection_latencies)
+        median = statistics.median(samples)
+        p95 = samples[int(len(samples) * 0.95) - 1] if len(samples) >= 20 else samples[-1]
+        report = f"检测延迟: 中位数 {median:.2f}s | P95 {p95:.2f}s | 样本 {len(samples)}"
+        if median > LATENCY_TARGET:
+            logger.warning(f"{report}，超过目标 {LATENCY_TARGET}s")
+        else:
+            logger.info(report)
+
+
+async def main_async():
+    logger.info("📡 正在启动以色列空袭实时监控（低延迟模式）...")
+    async with aiohttp.ClientSession() as session:
+        tasks = [poll_loop(session), latency_report_loop()]
+        if STREAM_URL:
+            tasks.append(stream_loop(session))
+        await asyncio.gather(*tasks)
+
+
 def main():
     logger.info("📡 正在启动以色列空袭实时监控...")
     # send_telegram_message("📡 正在启动以色列空袭实时监控...")
@@ -98,4 +273,9 @@ def main():
 
 
 if __name__ == "__main__":
-    main()
+    # 只在独立运行时配置日志，被 runner / bench 导入时由它们统一配置
+    setup_logging("ys_monitor")
+    if LOW_LATENCY_MODE:
+        asyncio.run(main_async())
+    else:
+        main()